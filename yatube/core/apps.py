@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     name = 'core'
     verbose_name = 'Ядро'
+
+    def ready(self):
+        from . import tracing
+        tracing.install()
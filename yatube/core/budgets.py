@@ -0,0 +1,125 @@
+"""Бюджеты запросов к базе для представлений.
+
+@query_budget(n) объявляет, сколько запросов представлению можно
+сделать за один вызов, включая проверки условного GET, кэш ленты
+и сессию пользователя. Режим задаёт QUERY_BUDGET_MODE:
+
+* 'raise' (тесты, стейджинг) — перерасход роняет запрос
+  с QueryBudgetExceeded, и N+1 не доходит до продакшена;
+* 'log' — проверяется доля QUERY_BUDGET_SAMPLE_RATE запросов,
+  перерасход пишется в лог с повторяющимися запросами и местом
+  в коде, откуда пришёл повтор;
+* 'off' — представление вызывается как есть.
+
+Представлению, которое обходит несколько баз (шарды постов),
+per_database добавляет столько запросов на каждую базу сверх первой.
+
+BEGIN, точки сохранения и запросы к таблицам из
+QUERY_BUDGET_IGNORED_TABLES не считаются.
+"""
+import logging
+import random
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Имя представления -> бюджет; заполняется декоратором при импорте.
+BUDGETS = {}
+IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+# Управление транзакциями — не запросы за данными.
+TRANSACTION_CONTROL = ('BEGIN', 'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'COMMIT')
+STACK_DEPTH = 8
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """SQL без различий в длине списков IN (...)."""
+    return IN_LIST.sub('(...)', sql)
+
+
+def _project_stack():
+    # Кадры самого проекта: фреймворк и библиотеки только мешают
+    # увидеть, какая строка кода делает запрос в цикле.
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in frame.filename
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_DEPTH:]))
+
+
+class QueryLog:
+    def __init__(self):
+        self.fingerprints = Counter()
+        self.stacks = {}
+        self.databases = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(TRANSACTION_CONTROL) or any(
+            table in sql for table in settings.QUERY_BUDGET_IGNORED_TABLES
+        ):
+            return execute(sql, params, many, context)
+        self.databases.add(context['connection'].alias)
+        key = fingerprint(sql)
+        self.fingerprints[key] += 1
+        if self.fingerprints[key] == 2:
+            self.stacks[key] = _project_stack()
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return sum(self.fingerprints.values())
+
+    def report(self, name, limit):
+        lines = [f'{name}: {self.count} запросов при бюджете {limit}']
+        for key, count in self.fingerprints.most_common():
+            if count < 2:
+                break
+            lines.append(f'{count} × {key}')
+            if self.stacks.get(key):
+                lines.append(self.stacks[key].rstrip())
+        return '\n'.join(lines)
+
+
+def query_budget(limit, per_database=0):
+    """Не больше limit запросов к базе за вызов представления.
+
+    Плюс per_database на каждую базу, к которой оно обратилось,
+    кроме первой.
+    """
+    def decorator(view):
+        name = f'{view.__module__}.{view.__name__}'
+        BUDGETS[name] = limit
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            mode = settings.QUERY_BUDGET_MODE
+            if mode == 'off' or mode == 'log' and (
+                random.random() >= settings.QUERY_BUDGET_SAMPLE_RATE
+            ):
+                return view(request, *args, **kwargs)
+            log = QueryLog()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(log))
+                response = view(request, *args, **kwargs)
+            allowed = limit + per_database * max(len(log.databases) - 1, 0)
+            if log.count > allowed:
+                message = log.report(name, allowed)
+                if mode == 'raise':
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
@@ -0,0 +1,203 @@
+"""Кэш в SQLite-файле, общий для всех процессов на одной машине.
+
+В отличие от LocMemCache каждый воркер видит одни и те же записи,
+поэтому инвалидация, сделанная одним процессом, действует для всех.
+Файл открывается в режиме WAL: читатели не блокируют друг друга
+и писателя, а внешний демон не нужен.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+    ') WITHOUT ROWID'
+)
+# Параметры запроса SQLite ограничены, get_many/delete_many идут пачками.
+MAX_PARAMS = 500
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        options = params.get('OPTIONS', {})
+        self.busy_timeout = options.get('BUSY_TIMEOUT', 5000)
+        self.cull_every = options.get('CULL_EVERY', 1000)
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            db.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout)}')
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            db.execute(SCHEMA)
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    @contextmanager
+    def _write(self):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        self._writes += 1
+        if self.cull_every and self._writes % self.cull_every == 0:
+            self._cull()
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dump(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _alive(self, expires):
+        return expires is None or expires > time.time()
+
+    def get(self, key, default=None, version=None):
+        row = self._db.execute(
+            'SELECT value, expires FROM cache WHERE key = ?',
+            (self._key(key, version),)
+        ).fetchone()
+        if row is None or not self._alive(row[1]):
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        names = list(keys)
+        for start in range(0, len(names), MAX_PARAMS):
+            chunk = names[start:start + MAX_PARAMS]
+            rows = self._db.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN ({})'
+                .format(', '.join('?' * len(chunk))),
+                chunk
+            )
+            for name, value, expires in rows:
+                if self._alive(expires):
+                    found[keys[name]] = pickle.loads(value)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._dump(value), expires)
+            for key, value in data.items()
+        ]
+        with self._write() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows
+            )
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as db:
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time())
+            )
+            return db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._dump(value), self.get_backend_timeout(timeout))
+            ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        name = self._key(key, version)
+        with self._write() as db:
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (name,)
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dump(value), name)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._write() as db:
+            return db.execute(
+                'UPDATE cache SET expires = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (
+                    self.get_backend_timeout(timeout),
+                    self._key(key, version),
+                    time.time()
+                )
+            ).rowcount == 1
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version) is not self
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        names = [self._key(key, version) for key in keys]
+        with self._write() as db:
+            for start in range(0, len(names), MAX_PARAMS):
+                chunk = names[start:start + MAX_PARAMS]
+                db.execute(
+                    'DELETE FROM cache WHERE key IN ({})'.format(
+                        ', '.join('?' * len(chunk))
+                    ),
+                    chunk
+                )
+
+    def clear(self):
+        with self._write() as db:
+            db.execute('DELETE FROM cache')
+
+    def _cull(self):
+        """Удаляет просроченные записи и самые старые сверх MAX_ENTRIES."""
+        db = self._db
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        excess = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - (
+            self._max_entries
+        )
+        if excess > 0:
+            db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (excess + self._max_entries // self._cull_frequency,)
+            )
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами, как и у LocMemCache.
+        pass
@@ -0,0 +1,133 @@
+"""SQLite-бэкенд, настроенный под параллельные запросы.
+
+Отличия от django.db.backends.sqlite3:
+
+* при открытии соединения ставятся PRAGMA из DEFAULT_PRAGMAS
+  (WAL: читатели не ждут писателя), их можно переопределить
+  в OPTIONS['pragmas'], а значение None отключает PRAGMA;
+* atomic() начинает транзакцию с BEGIN IMMEDIATE: блокировка
+  на запись берётся сразу и ждёт busy_timeout, а не падает
+  с «database is locked» при повышении блокировки посреди
+  транзакции;
+* запрос вне транзакции и сам BEGIN при занятой базе повторяются
+  до OPTIONS['lock_retries'] раз с экспоненциальной паузой;
+* соединение, переживающее запрос (CONN_MAX_AGE), перед каждым
+  запросом проверяется: SELECT 1 и тот же ли файл лежит по пути
+  базы (copy_replicas подменяет файл реплики).
+"""
+import os
+import random
+import time
+
+from django.db.backends.sqlite3 import base
+from django.db.backends.sqlite3.base import Database
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+DEFAULT_LOCK_RETRIES = 5
+DEFAULT_LOCK_BACKOFF = 0.02
+LOCKED_MESSAGES = ('database is locked', 'database table is locked')
+
+
+def apply_pragmas(connection, pragmas):
+    for name, value in pragmas.items():
+        if value is not None:
+            connection.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    return any(message in str(error) for message in LOCKED_MESSAGES)
+
+
+def retry_locked(call, connection, retries, backoff):
+    """Вызывает call(), повторяя его, пока база занята.
+
+    Повтор безопасен только вне транзакции: внутри неё часть
+    изменений уже сделана, и решать, что делать, должен вызывающий.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return call()
+        except Database.OperationalError as error:
+            if (
+                attempt == retries or connection.in_transaction
+                or not is_locked(error)
+            ):
+                raise
+            time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+class CursorWrapper(base.SQLiteCursorWrapper):
+    lock_retries = DEFAULT_LOCK_RETRIES
+    lock_backoff = DEFAULT_LOCK_BACKOFF
+
+    def execute(self, query, params=None):
+        parent = super().execute
+        return retry_locked(
+            lambda: parent(query, params),
+            self.connection, self.lock_retries, self.lock_backoff
+        )
+
+    def executemany(self, query, param_list):
+        parent = super().executemany
+        param_list = list(param_list)
+        return retry_locked(
+            lambda: parent(query, param_list),
+            self.connection, self.lock_retries, self.lock_backoff
+        )
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = params.pop('transaction_mode', 'IMMEDIATE')
+        self.lock_retries = params.pop('lock_retries', DEFAULT_LOCK_RETRIES)
+        self.lock_backoff = params.pop('lock_backoff', DEFAULT_LOCK_BACKOFF)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, self.pragmas)
+        self.file_id = self._file_id()
+        return connection
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=CursorWrapper)
+        cursor.lock_retries = self.lock_retries
+        cursor.lock_backoff = self.lock_backoff
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
+
+    def _file_id(self):
+        if self.is_in_memory_db():
+            return None
+        try:
+            stat = os.stat(self.settings_dict['NAME'])
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def is_usable(self):
+        try:
+            self.connection.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return self._file_id() == self.file_id
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if (
+            self.connection is not None
+            and not self.in_atomic_block
+            and not self.is_usable()
+        ):
+            self.close()
@@ -0,0 +1,124 @@
+"""Отдача файлов с диска без чтения их в память.
+
+Ответ строится на FileResponse поверх открытого файла: WSGI-сервер
+с wsgi.file_wrapper (gunicorn, uwsgi) передаёт его через sendfile,
+остальные читают блоками, так что память воркера не растёт
+с размером файла. Поддерживаются ETag, If-Modified-Since
+и один диапазон Range (с If-Range).
+"""
+import mimetypes
+import os
+import re
+
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFile:
+    """Часть файла: не больше length байт начиная с offset.
+
+    fileno() и позиция в файле сохраняются, поэтому sendfile
+    сервера отправит ровно Content-Length байт с нужного места.
+    """
+
+    def __init__(self, file, offset, length):
+        file.seek(offset)
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(начало, конец) включительно или None, если диапазон не нужен.
+
+    Несколько диапазонов и непонятный заголовок игнорируются — файл
+    отдаётся целиком. Для недостижимого диапазона ValueError.
+    """
+    match = RANGE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(last), size - 1) if last else size - 1
+    if end < start:
+        return None
+    return start, end
+
+
+def serve_file(request, path, content_type=None, cache_control=None):
+    stat = os.stat(path)
+    etag = '"{:x}-{:x}"'.format(stat.st_mtime_ns, stat.st_size)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = _file_response(
+            request, path, stat.st_size, etag, last_modified,
+            content_type or mimetypes.guess_type(path)[0]
+            or 'application/octet-stream'
+        )
+    if response.status_code in (200, 206, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        if cache_control:
+            response['Cache-Control'] = cache_control
+    return response
+
+
+def _file_response(request, path, size, etag, last_modified, content_type):
+    header = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (etag, http_date(last_modified)):
+        # Файл поменялся с тех пор, как клиент получил начало.
+        header = ''
+    try:
+        byte_range = parse_range(header, size) if header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(
+            RangeFile(file, start, length),
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = length
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,64 @@
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает задержку попаданий LocMemCache и SQLiteCache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument(
+            '--size', type=int, default=2048,
+            help='Размер значения в байтах (примерно как карточка поста).'
+        )
+
+    def handle(self, *args, keys, rounds, size, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'LocMemCache': LocMemCache('bench', {}),
+                'SQLiteCache': SQLiteCache(
+                    os.path.join(directory, 'bench.sqlite3'), {}
+                ),
+            }
+            for name, cache in backends.items():
+                cache._max_entries = keys * 2
+                self.report(name, self.measure(cache, keys, rounds, size))
+
+    def measure(self, cache, keys, rounds, size):
+        names = [f'post_card:{number}' for number in range(keys)]
+        cache.set_many({name: 'x' * size for name in names}, None)
+        timings = {'get': [], 'get_many(10)': []}
+        for _ in range(rounds):
+            for name in names:
+                started = time.perf_counter()
+                cache.get(name)
+                timings['get'].append(time.perf_counter() - started)
+            for start in range(0, keys, 10):
+                started = time.perf_counter()
+                cache.get_many(names[start:start + 10])
+                timings['get_many(10)'].append(
+                    time.perf_counter() - started
+                )
+        return timings
+
+    def report(self, name, timings):
+        for operation, samples in timings.items():
+            samples.sort()
+            self.stdout.write(
+                '{:<12} {:<13} p50 {:8.1f} мкс  p99 {:8.1f} мкс  '
+                'среднее {:8.1f} мкс'.format(
+                    name,
+                    operation,
+                    samples[len(samples) // 2] * 1e6,
+                    samples[int(len(samples) * 0.99)] * 1e6,
+                    statistics.mean(samples) * 1e6
+                )
+            )
@@ -0,0 +1,167 @@
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+
+from core.db.backends.sqlite3.base import (
+    DEFAULT_LOCK_BACKOFF,
+    DEFAULT_LOCK_RETRIES,
+    DEFAULT_PRAGMAS,
+    apply_pragmas,
+    is_locked,
+    retry_locked
+)
+
+# Как открывает базу стандартный бэкенд Django и как — core.db.
+CONFIGS = {
+    'django': {'pragmas': {}, 'begin': 'BEGIN', 'retries': 0},
+    'core.db': {
+        'pragmas': DEFAULT_PRAGMAS,
+        'begin': 'BEGIN IMMEDIATE',
+        'retries': DEFAULT_LOCK_RETRIES,
+    },
+}
+
+SCHEMA = """
+CREATE TABLE post (
+    id INTEGER PRIMARY KEY, author_id INTEGER, text TEXT, pub_date REAL
+);
+CREATE INDEX post_feed ON post (pub_date DESC, id DESC);
+CREATE INDEX post_author ON post (author_id, pub_date DESC);
+CREATE TABLE counter (author_id INTEGER PRIMARY KEY, posts INTEGER);
+"""
+FEED = 'SELECT id, author_id, text FROM post ORDER BY pub_date DESC LIMIT 10'
+PROFILE = (
+    'SELECT id, text FROM post WHERE author_id = ? '
+    'ORDER BY pub_date DESC LIMIT 10'
+)
+
+
+def prepare(path, posts, authors):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    now = time.time()
+    db.executemany(
+        'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+        (
+            (number % authors, 'текст ' * 40, now - posts + number)
+            for number in range(posts)
+        )
+    )
+    db.executemany(
+        'INSERT INTO counter VALUES (?, ?)',
+        ((author, posts // authors) for author in range(authors))
+    )
+    db.commit()
+    db.close()
+
+
+def work(job):
+    """Читает или пишет до дедлайна; возвращает задержки и ошибки."""
+    path, config, role, number, deadline, authors = job
+    db = sqlite3.connect(path, isolation_level=None, timeout=5)
+    apply_pragmas(db, config['pragmas'])
+    latencies = []
+    errors = 0
+    step = 0
+    while time.time() < deadline:
+        step += 1
+        author = (number * 7919 + step) % authors
+        started = time.perf_counter()
+        try:
+            if role == 'reader':
+                db.execute(FEED).fetchall()
+                db.execute(PROFILE, (author,)).fetchall()
+            else:
+                write(db, config, author)
+        except sqlite3.OperationalError as error:
+            if not is_locked(error):
+                raise
+            errors += 1
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+            continue
+        latencies.append(time.perf_counter() - started)
+    db.close()
+    return role, latencies, errors
+
+
+def write(db, config, author):
+    # Как save() с сигналами: чтение, потом запись в одной транзакции.
+    retry_locked(
+        lambda: db.execute(config['begin']),
+        db, config['retries'], DEFAULT_LOCK_BACKOFF
+    )
+    db.execute(
+        'SELECT posts FROM counter WHERE author_id = ?', (author,)
+    ).fetchone()
+    db.execute(
+        'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+        (author, 'новый пост', time.time())
+    )
+    db.execute(
+        'UPDATE counter SET posts = posts + 1 WHERE author_id = ?', (author,)
+    )
+    db.execute('COMMIT')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стандартный SQLite-бэкенд Django и core.db под '
+        'параллельными читателями и писателями в отдельных процессах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--authors', type=int, default=500)
+
+    def handle(self, *args, readers, writers, duration, posts, authors,
+               **options):
+        for name, config in CONFIGS.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                prepare(path, posts, authors)
+                deadline = time.time() + duration
+                jobs = [
+                    (path, config, 'reader', number, deadline, authors)
+                    for number in range(readers)
+                ] + [
+                    (path, config, 'writer', number, deadline, authors)
+                    for number in range(writers)
+                ]
+                with get_context().Pool(len(jobs)) as pool:
+                    results = pool.map(work, jobs)
+            for role in ('reader', 'writer'):
+                latencies = sorted(
+                    latency for kind, values, _ in results
+                    if kind == role for latency in values
+                )
+                errors = sum(
+                    count for kind, _, count in results if kind == role
+                )
+                self.report(name, role, latencies, errors, duration)
+
+    def report(self, name, role, latencies, errors, duration):
+        if not latencies:
+            self.stdout.write(f'{name:<8} {role:<7} нет успешных операций, '
+                              f'ошибок {errors}')
+            return
+        self.stdout.write(
+            '{:<8} {:<7} {:8.0f} оп/с  p50 {:7.2f} мс  p99 {:8.2f} мс  '
+            'среднее {:7.2f} мс  locked {}'.format(
+                name,
+                role,
+                len(latencies) / duration,
+                latencies[len(latencies) // 2] * 1e3,
+                latencies[int(len(latencies) * 0.99)] * 1e3,
+                statistics.mean(latencies) * 1e3,
+                errors
+            )
+        )
@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+def copy_database(source, target):
+    """Согласованная копия SQLite-файла через backup API.
+
+    Копия пишется рядом и подменяет реплику одним rename: открытые
+    соединения дочитывают старый файл, новые видят уже новый.
+    """
+    partial = f'{target}.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    primary = sqlite3.connect(source)
+    copy = sqlite3.connect(partial)
+    try:
+        primary.backup(copy)
+        # Без WAL у копии нет файлов -wal и -shm, которые остались бы
+        # от прежней копии после подмены.
+        copy.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        copy.close()
+        primary.close()
+    os.replace(partial, target)
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную SQLite-базу в файлы реплик из '
+        'DATABASE_REPLICAS — локальная замена репликации.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять копирование раз в столько секунд.'
+        )
+
+    def handle(self, *args, interval, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('DATABASE_REPLICAS пуст.')
+        databases = settings.DATABASES
+        for alias in (DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS):
+            if not databases[alias]['ENGINE'].endswith('sqlite3'):
+                raise CommandError(f'{alias}: копируются только SQLite-базы')
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.perf_counter()
+                copy_database(
+                    databases[DEFAULT_DB_ALIAS]['NAME'],
+                    databases[alias]['NAME']
+                )
+                self.stdout.write('{}: скопировано за {:.2f} с'.format(
+                    alias, time.perf_counter() - started
+                ))
+            if not interval:
+                break
+            time.sleep(interval)
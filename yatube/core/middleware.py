@@ -0,0 +1,67 @@
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+
+from .files import serve_file
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Файлы без хэша в имени могут поменяться под тем же адресом.
+REVALIDATE = 'public, max-age=0, must-revalidate'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную статику, когда перед Django нет nginx.
+
+    Выбирает заранее сжатую копию по Accept-Encoding, а файлам
+    с хэшем в имени ставит Cache-Control: immutable.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.hashed_names = set(
+            getattr(staticfiles_storage, 'hashed_files', {}).values()
+        )
+
+    def __call__(self, request):
+        if (
+            request.method in ('GET', 'HEAD')
+            and request.path.startswith(self.prefix)
+        ):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        content_type, _ = mimetypes.guess_type(path)
+        accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        encoding = None
+        for candidate, suffix in ENCODINGS:
+            if candidate in accepted and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+        response = serve_file(
+            request,
+            path,
+            content_type=content_type,
+            cache_control=(
+                IMMUTABLE if name in self.hashed_names else REVALIDATE
+            )
+        )
+        if encoding and response.status_code in (200, 206):
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -0,0 +1,112 @@
+"""Чтение лент с реплик и «прилипание» к основной базе после записи.
+
+Представления, помеченные @replica_reads, читают с одной из реплик
+DATABASE_REPLICAS (одной на весь запрос, чтобы чтения были
+согласованы между собой). Все записи идут в основную базу.
+
+Запрос, в котором была запись, ставит cookie REPLICA_PIN_COOKIE
+на REPLICA_PIN_SECONDS: пока она жива, браузер пользователя читает
+только основную базу и видит свои посты, комментарии и подписки,
+даже если реплика отстаёт. После записи и до конца запроса чтения
+тоже идут в основную базу.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Сессии и пользователи всегда читаются из основной базы: сессия,
+# которой ещё нет на реплике, разлогинила бы пользователя.
+PRIMARY_APPS = ('auth', 'sessions')
+
+_state = ContextVar('replica_state', default=None)
+
+
+class RequestState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.replica = None
+        self.wrote = False
+
+
+def _replica():
+    state = _state.get()
+    if state is None or state.wrote or state.replica is None:
+        return None
+    return state.replica
+
+
+def note_write():
+    """Отмечает, что текущий запрос пишет в базу."""
+    state = _state.get()
+    if state is not None:
+        state.wrote = True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return _replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        # Явный ответ: иначе Django отправил бы запись объекта,
+        # прочитанного с реплики, туда же.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики — копии основной базы, схему им приносит копирование.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def replica_reads(view):
+    """Разрешает представлению читать с реплики, если нет прилипания."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if (
+            state is None or state.pinned
+            or not settings.DATABASE_REPLICAS
+        ):
+            return view(request, *args, **kwargs)
+        state.replica = random.choice(settings.DATABASE_REPLICAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica = None
+    return wrapper
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RequestState(
+            pinned=settings.REPLICA_PIN_COOKIE in request.COOKIES
+        )
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
@@ -0,0 +1,209 @@
+"""64-битные id, упорядоченные по времени (Snowflake).
+
+Id складывается из миллисекунд с EPOCH (41 бит), номера воркера
+(10 бит) и счётчика внутри миллисекунды (12 бит). Каждый процесс
+выдаёт id сам, без обращения к базе, а сортировка по id совпадает
+с сортировкой по времени создания, поэтому лентам хватает курсора
+из одного первичного ключа.
+
+Номер воркера должен быть своим у каждого процесса: два процесса
+с одним номером выдадут одинаковые id. Процесс арендует свободный
+номер в кэше атомарным add (WorkerLease) при первом id и заново
+после fork, а аренду продлевает, пока выдаёт id. Номера различны
+у всех процессов, которые видят один кэш; на нескольких машинах
+кэш должен быть общим, иначе номер задаётся явно, своим у каждого
+процесса, в SNOWFLAKE_WORKER_ID. Воркер RESERVED_WORKER отдан id,
+которые строятся из прошлых дат (seed), чтобы они не совпали
+с выданными вживую.
+
+Старые строки с автоинкрементными id остаются как есть: любой
+Snowflake-id больше любого из них, так что по id они идут раньше.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+EPOCH = datetime(2022, 1, 1, tzinfo=timezone.utc)
+EPOCH_MS = int(EPOCH.timestamp() * 1000)
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+RESERVED_WORKER = MAX_WORKER
+# Насколько могут отстать часы, чтобы генератор ещё подождал их,
+# а не остановил выдачу id с ошибкой.
+MAX_CLOCK_DRIFT_MS = 1000
+
+
+class ClockMovedBackwards(Exception):
+    pass
+
+
+def compose(milliseconds, worker, sequence):
+    return (
+        (milliseconds - EPOCH_MS) << (WORKER_BITS + SEQUENCE_BITS)
+        | (worker << SEQUENCE_BITS)
+        | sequence
+    )
+
+
+def from_datetime(value, worker=RESERVED_WORKER, sequence=0):
+    """Id для момента value; с sequence=0 — наименьший в его миллисекунде."""
+    if not 0 <= sequence <= MAX_SEQUENCE:
+        # Обрезанный счётчик молча совпал бы с чужим id.
+        raise ValueError(f'Счётчик должен быть от 0 до {MAX_SEQUENCE}')
+    return compose(int(value.timestamp() * 1000), worker, sequence)
+
+
+def to_datetime(snowflake):
+    milliseconds = (snowflake >> (WORKER_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return datetime.fromtimestamp(milliseconds / 1000, tz=timezone.utc)
+
+
+def worker_of(snowflake):
+    return (snowflake >> SEQUENCE_BITS) & MAX_WORKER
+
+
+class Generator:
+    def __init__(self, worker):
+        if not 0 <= worker < RESERVED_WORKER:
+            raise ValueError(
+                f'Номер воркера должен быть от 0 до {RESERVED_WORKER - 1}'
+            )
+        self.worker = worker
+        self.last = 0
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            now = self._now()
+            if now < self.last:
+                if self.last - now > MAX_CLOCK_DRIFT_MS:
+                    raise ClockMovedBackwards(
+                        f'Часы отстали на {self.last - now} мс'
+                    )
+                now = self._wait(self.last)
+            if now == self.last:
+                self.sequence = (self.sequence + 1) & MAX_SEQUENCE
+                if self.sequence == 0:
+                    # Счётчик миллисекунды исчерпан.
+                    now = self._wait(self.last + 1)
+            else:
+                self.sequence = 0
+            self.last = now
+            return compose(now, self.worker, self.sequence)
+
+    def _now(self):
+        return time.time_ns() // 1_000_000
+
+    def _wait(self, milliseconds):
+        now = self._now()
+        while now < milliseconds:
+            time.sleep((milliseconds - now) / 1000)
+            now = self._now()
+        return now
+
+
+def lease_key(worker):
+    return f'snowflake-worker:{worker}'
+
+
+class WorkerLease:
+    """Аренда номера воркера в кэше на SNOWFLAKE_LEASE_TIMEOUT секунд."""
+
+    def __init__(self):
+        self.token = uuid.uuid4().hex
+        self.timeout = settings.SNOWFLAKE_LEASE_TIMEOUT
+        self.worker = None
+        self.renewed = 0
+
+    def acquire(self):
+        # Поиск начинается с номера от pid, чтобы процессы, стартующие
+        # вместе, не перебирали одни и те же занятые номера.
+        start = os.getpid() % RESERVED_WORKER
+        for offset in range(RESERVED_WORKER):
+            worker = (start + offset) % RESERVED_WORKER
+            if cache.add(lease_key(worker), self.token, self.timeout):
+                self.worker = worker
+                self.renewed = time.monotonic()
+                return worker
+        raise ImproperlyConfigured('Все номера воркеров Snowflake заняты')
+
+    def renew(self):
+        """Продлевает аренду; False — номер потерян и нужен новый."""
+        if time.monotonic() - self.renewed < self.timeout / 2:
+            return True
+        key = lease_key(self.worker)
+        if cache.get(key) != self.token or not cache.touch(
+            key, self.timeout
+        ):
+            return False
+        self.renewed = time.monotonic()
+        return True
+
+
+_generator = None
+_lease = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _worker():
+    """Номер воркера процесса и его аренда (None для явного номера)."""
+    if settings.SNOWFLAKE_WORKER_ID is not None:
+        return int(settings.SNOWFLAKE_WORKER_ID), None
+    lease = WorkerLease()
+    return lease.acquire(), lease
+
+
+def next_id():
+    global _generator, _lease, _pid
+    with _lock:
+        # После fork дочерний процесс арендует свой номер: номер
+        # родителя остаётся за родителем.
+        if _pid != os.getpid() or (
+            _lease is not None and not _lease.renew()
+        ):
+            worker, _lease = _worker()
+            _generator = Generator(worker)
+            _pid = os.getpid()
+        generate = _generator
+    return generate()
+
+
+class SnowflakeField(models.BigIntegerField):
+    """Первичный ключ, который получает Snowflake-id при вставке.
+
+    Id назначается в pre_save, а не через default: с default Django
+    считал бы ключ заданным и перед каждым INSERT пробовал UPDATE.
+    Явный default=None говорит фабрикам тестовых данных (mixer), что
+    значение придумывать не нужно.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('primary_key', True)
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('default', None)
+        super().__init__(*args, **kwargs)
+
+    def db_type(self, connection):
+        # В SQLite только столбец INTEGER PRIMARY KEY — это rowid,
+        # на который опираются индексы FTS5 и кластеризация строк.
+        if connection.vendor == 'sqlite':
+            return 'integer'
+        return super().db_type(connection)
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if add and value is None:
+            value = next_id()
+            setattr(model_instance, self.attname, value)
+        return value
@@ -0,0 +1,64 @@
+"""Хранилище статики с хэшами в именах и заранее сжатыми копиями.
+
+collectstatic пишет файлы вида bootstrap.min.3f2a….css и рядом с
+ними .gz и, если установлен brotli, .br. Манифест читается один раз
+при создании хранилища, и дальше {% static %} не трогает диск.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (
+    '.css', '.js', '.svg', '.ico', '.json', '.map', '.txt', '.xml', '.html'
+)
+
+
+def _encoders():
+    yield '.gz', lambda data: gzip.compress(data, 9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Файл, которого нет в манифесте (collectstatic ещё не запускали
+    # или файл добавили позже), отдаётся под исходным именем, а не
+    # роняет страницу с ValueError.
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = []
+        for original, processed, done in super().post_process(
+            paths, dry_run, **options
+        ):
+            if processed and not isinstance(processed, Exception):
+                hashed.append(processed)
+            yield original, processed, done
+        if not dry_run:
+            for name in hashed:
+                if name.endswith(COMPRESSIBLE):
+                    self.compress(name)
+
+    def compress(self, name):
+        """Пишет сжатые копии файла, если они меньше оригинала."""
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            data = source.read()
+        for suffix, encode in _encoders():
+            packed = encode(data)
+            if len(packed) < len(data):
+                with open(path + suffix, 'wb') as target:
+                    target.write(packed)
+            elif os.path.exists(path + suffix):
+                os.remove(path + suffix)
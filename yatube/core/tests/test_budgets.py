@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.budgets import QueryBudgetExceeded, fingerprint, query_budget
+
+User = get_user_model()
+
+
+@query_budget(1)
+def chatty_view(request):
+    for username in ('first', 'second', 'third'):
+        User.objects.filter(username=username).exists()
+    return HttpResponse('ok')
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    @override_settings(QUERY_BUDGET_MODE='raise')
+    def test_raise_on_overrun(self):
+        """В режиме raise перерасход роняет запрос с повтором в тексте."""
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            chatty_view(self.request)
+        message = str(raised.exception)
+        self.assertIn('3 запросов при бюджете 1', message)
+        self.assertIn('3 × SELECT', message)
+        self.assertIn('chatty_view', message)
+
+    @override_settings(
+        QUERY_BUDGET_MODE='log', QUERY_BUDGET_SAMPLE_RATE=1.0
+    )
+    def test_log_on_overrun(self):
+        """В режиме log ответ отдаётся, а перерасход пишется в лог."""
+        with self.assertLogs('core.budgets', 'WARNING') as logs:
+            response = chatty_view(self.request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('chatty_view', logs.output[0])
+
+    @override_settings(
+        QUERY_BUDGET_MODE='log', QUERY_BUDGET_SAMPLE_RATE=0.0
+    )
+    def test_unsampled_request_not_checked(self):
+        """Запрос вне выборки не проверяется."""
+        self.assertEqual(chatty_view(self.request).status_code, 200)
+
+    def test_fingerprint_collapses_in_lists(self):
+        """Списки IN разной длины дают один отпечаток."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)')
+        )
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+from multiprocessing import get_context
+
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+
+
+def increment_in_child(path):
+    SQLiteCache(path, {}).incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.path = os.path.join(TEMP_CACHE_DIR, f'{self.id()}.sqlite3')
+        self.cache = SQLiteCache(self.path, {})
+
+    def test_get_set_many(self):
+        """set_many/get_many возвращают только существующие ключи."""
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']),
+            {'a': 1, 'b': [2]}
+        )
+        self.cache.delete_many(['a'])
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_add_and_incr(self):
+        """add не перезаписывает живой ключ, incr требует ключ."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 5))
+        self.assertEqual(self.cache.incr('key', 2), 3)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_key_is_missing(self):
+        """Просроченная запись не читается и может быть добавлена заново."""
+        self.cache.set('key', 'old', timeout=-1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_cache_is_shared_between_processes(self):
+        """Изменения из другого процесса видны через тот же файл."""
+        self.cache.set('counter', 1)
+        process = get_context('spawn').Process(
+            target=increment_in_child, args=(self.path,)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get('counter'), 2)
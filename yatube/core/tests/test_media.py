@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+CONTENT = bytes(range(256)) * 40
+URL = '/media/posts/file.bin'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServingTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'file.bin'),
+                  'wb') as file:
+            file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file_with_validators(self):
+        """Файл отдаётся целиком с ETag, Last-Modified и Accept-Ranges."""
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), CONTENT)
+        self.assertEqual(int(response['Content-Length']), len(CONTENT))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(
+            URL, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_ranges(self):
+        """Один диапазон отдаётся кодом 206, недостижимый — 416."""
+        cases = {
+            'bytes=10-19': (10, 19),
+            'bytes=-5': (len(CONTENT) - 5, len(CONTENT) - 1),
+            'bytes=10000-': (10000, len(CONTENT) - 1),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(range=header):
+                response = self.client.get(URL, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    response['Content-Range'],
+                    f'bytes {start}-{end}/{len(CONTENT)}'
+                )
+                self.assertEqual(
+                    self.body(response), CONTENT[start:end + 1]
+                )
+        response = self.client.get(URL, HTTP_RANGE='bytes=99999-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        """При устаревшем If-Range диапазон игнорируется."""
+        response = self.client.get(
+            URL, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), CONTENT)
+
+    def test_path_outside_media_root(self):
+        """Путь за пределами MEDIA_ROOT и несуществующий файл — 404."""
+        for url in ('/media/../manage.py', '/media/posts/missing.bin'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT='/protected-media/')
+    def test_accel_redirect(self):
+        """С MEDIA_ACCEL_REDIRECT отдачу файла выполняет nginx."""
+        response = self.client.get(URL)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/file.bin'
+        )
+        self.assertEqual(response.content, b'')
@@ -0,0 +1,106 @@
+import os
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings
+)
+from django.urls import reverse
+
+from core.management.commands.copy_replicas import copy_database
+from core.replicas import ReplicaMiddleware, ReplicaRouter, replica_reads
+from posts.models import Post
+
+User = get_user_model()
+
+
+def routing_view(request):
+    if request.GET.get('write'):
+        router.db_for_write(Post)
+    request.routes = {
+        'post': router.db_for_read(Post),
+        'user': router.db_for_read(User),
+    }
+    return HttpResponse()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TestCase):
+    def get(self, view, path='/', **cookies):
+        request = RequestFactory().get(path)
+        request.COOKIES.update(cookies)
+        response = ReplicaMiddleware(view)(request)
+        return request, response
+
+    def test_marked_view_reads_replica(self):
+        """Помеченное представление читает посты с реплики."""
+        request, response = self.get(replica_reads(routing_view))
+        self.assertEqual(request.routes['post'], 'replica')
+        self.assertEqual(request.routes['user'], 'default')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_unmarked_view_reads_primary(self):
+        """Непомеченное представление читает основную базу."""
+        request, _ = self.get(routing_view)
+        self.assertEqual(request.routes['post'], 'default')
+
+    def test_pinned_browser_reads_primary(self):
+        """С cookie прилипания чтения идут в основную базу."""
+        request, _ = self.get(
+            replica_reads(routing_view),
+            **{settings.REPLICA_PIN_COOKIE: '1'}
+        )
+        self.assertEqual(request.routes['post'], 'default')
+
+    def test_write_pins_browser(self):
+        """После записи чтения идут в основную базу и ставится cookie."""
+        request, response = self.get(
+            replica_reads(routing_view), path='/?write=1'
+        )
+        self.assertEqual(request.routes['post'], 'default')
+        self.assertEqual(
+            response.cookies[settings.REPLICA_PIN_COOKIE]['max-age'],
+            settings.REPLICA_PIN_SECONDS
+        )
+
+    def test_no_migrations_on_replica(self):
+        """На реплики миграции не применяются."""
+        self.assertIs(ReplicaRouter().allow_migrate('replica', 'posts'), False)
+        self.assertIsNone(ReplicaRouter().allow_migrate('default', 'posts'))
+
+    def test_comment_pins_browser(self):
+        """Комментарий через сайт ставит cookie прилипания."""
+        user = User.objects.create_user(username='replica-writer')
+        post = Post.objects.create(author=user, text='Пост')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Комментарий'}
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+
+class CopyReplicaTest(SimpleTestCase):
+    def test_copy_database(self):
+        """Копия SQLite-базы содержит данные основной."""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'primary.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            with sqlite3.connect(source) as db:
+                db.execute('CREATE TABLE t (value TEXT)')
+                db.execute("INSERT INTO t VALUES ('копия')")
+            db.close()
+            copy_database(source, target)
+            copy = sqlite3.connect(target)
+            self.assertEqual(
+                copy.execute('SELECT value FROM t').fetchall(), [('копия',)]
+            )
+            copy.close()
+            self.assertFalse(os.path.exists(f'{target}.partial'))
@@ -0,0 +1,150 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import snowflake
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class GeneratorTest(SimpleTestCase):
+    def test_ids_grow_and_carry_worker(self):
+        """Id растут и несут номер воркера."""
+        generate = snowflake.Generator(worker=7)
+        ids = [generate() for _ in range(5000)]
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual({snowflake.worker_of(value) for value in ids}, {7})
+
+    def test_unique_across_threads(self):
+        """Потоки одного генератора не получают одинаковых id."""
+        generate = snowflake.Generator(worker=1)
+        ids = []
+
+        def collect():
+            ids.extend(generate() for _ in range(2000))
+
+        threads = [threading.Thread(target=collect) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(ids)), 8000)
+
+    def test_sequence_overflow_waits_for_next_millisecond(self):
+        """Исчерпав счётчик миллисекунды, генератор ждёт следующую."""
+        generate = snowflake.Generator(worker=1)
+        clock = iter([1000] * (snowflake.MAX_SEQUENCE + 2) + [1001])
+        with mock.patch.object(generate, '_now', lambda: next(clock)):
+            ids = [generate() for _ in range(snowflake.MAX_SEQUENCE + 2)]
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(
+            snowflake.to_datetime(ids[-1]) - snowflake.to_datetime(ids[0]),
+            timedelta(milliseconds=1)
+        )
+
+    def test_clock_moved_backwards(self):
+        """Часы, ушедшие далеко назад, останавливают выдачу id."""
+        generate = snowflake.Generator(worker=1)
+        clock = iter([10_000, 10_000 - snowflake.MAX_CLOCK_DRIFT_MS - 1])
+        with mock.patch.object(generate, '_now', lambda: next(clock)):
+            generate()
+            with self.assertRaises(snowflake.ClockMovedBackwards):
+                generate()
+
+    def test_reserved_worker(self):
+        """Зарезервированный воркер не выдаётся процессам."""
+        with self.assertRaises(ValueError):
+            snowflake.Generator(worker=snowflake.RESERVED_WORKER)
+
+    def test_datetime_round_trip(self):
+        """Id из даты возвращает эту дату с точностью до миллисекунды."""
+        moment = datetime(2024, 5, 1, 12, 30, 15, 123000, tzinfo=timezone.utc)
+        value = snowflake.from_datetime(moment, sequence=3)
+        self.assertEqual(snowflake.to_datetime(value), moment)
+        self.assertLess(
+            value, snowflake.from_datetime(moment + timedelta(milliseconds=1))
+        )
+
+    def test_sequence_overflow_raises(self):
+        """Счётчик за пределами 12 бит не обрезается молча."""
+        moment = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        with self.assertRaises(ValueError):
+            snowflake.from_datetime(
+                moment, sequence=snowflake.MAX_SEQUENCE + 1
+            )
+
+
+@override_settings(SNOWFLAKE_WORKER_ID=None)
+class WorkerLeaseTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        state = (snowflake._generator, snowflake._lease, snowflake._pid)
+        self.addCleanup(self.restore, state)
+
+    def restore(self, state):
+        snowflake._generator, snowflake._lease, snowflake._pid = state
+
+    def test_processes_with_one_config_get_own_workers(self):
+        """Два генератора с одними настройками не выдают одинаковых id
+        даже в одну миллисекунду."""
+        generators = [
+            snowflake.Generator(snowflake.WorkerLease().acquire())
+            for _ in range(2)
+        ]
+        self.assertNotEqual(generators[0].worker, generators[1].worker)
+        with mock.patch.object(snowflake.Generator, '_now', return_value=1):
+            ids = [generate() for generate in generators for _ in range(5)]
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_child_process_leases_new_worker(self):
+        """После fork дочерний процесс берёт не номер родителя."""
+        with mock.patch('os.getpid', return_value=100):
+            parent = snowflake.worker_of(snowflake.next_id())
+        # Поиск номера у ребёнка начнётся с того же места, что у родителя.
+        child_pid = 100 + snowflake.RESERVED_WORKER
+        with mock.patch('os.getpid', return_value=child_pid):
+            child = snowflake.worker_of(snowflake.next_id())
+        self.assertNotEqual(parent, child)
+
+    def test_lost_lease_is_replaced(self):
+        """Номер, аренда которого пропала из кэша, не продлевается."""
+        lease = snowflake.WorkerLease()
+        worker = lease.acquire()
+        self.assertTrue(lease.renew())
+        cache.delete(snowflake.lease_key(worker))
+        lease.renewed -= lease.timeout
+        self.assertFalse(lease.renew())
+
+
+class SnowflakeFieldTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='snowflake')
+
+    def test_ids_follow_creation_order(self):
+        """Посты получают Snowflake-id в порядке создания."""
+        posts = [
+            Post.objects.create(author=self.user, text=str(number))
+            for number in range(3)
+        ]
+        self.assertTrue(all(post.pk > 1 << 22 for post in posts))
+        self.assertEqual(
+            list(Post.objects.all()), list(reversed(posts))
+        )
+
+    def test_bulk_create_assigns_ids(self):
+        """bulk_create назначает id и возвращает их в объектах."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comments = Comment.objects.bulk_create(
+            Comment(post=post, author=self.user, text=str(number))
+            for number in range(3)
+        )
+        self.assertEqual(
+            sorted(comment.pk for comment in comments),
+            sorted(Comment.objects.values_list('pk', flat=True))
+        )
@@ -0,0 +1,101 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase
+
+from core.db.backends.sqlite3.base import DatabaseWrapper, retry_locked
+
+
+def locked_call(failures):
+    """Функция, которая failures раз падает с «database is locked»."""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise sqlite3.OperationalError('database is locked')
+        return 'ok'
+    return call, calls
+
+
+class SQLiteBackendTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'db.sqlite3')
+
+    def wrapper(self, **options):
+        settings_dict = {
+            **connection.settings_dict,
+            'NAME': self.path,
+            'OPTIONS': options,
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias='backend-test')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_default_pragmas(self):
+        """Новое соединение открывается в WAL с synchronous=NORMAL."""
+        wrapper = self.wrapper()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+
+    def test_pragmas_override(self):
+        """PRAGMA из OPTIONS заменяют умолчания, None их отключает."""
+        wrapper = self.wrapper(
+            pragmas={'journal_mode': 'delete', 'mmap_size': None}
+        )
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 0)
+
+    def test_atomic_begins_immediate(self):
+        """atomic() сразу берёт блокировку на запись."""
+        wrapper = self.wrapper()
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (value INTEGER)')
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        connections['backend-test'] = wrapper
+        self.addCleanup(delattr, connections._connections, 'backend-test')
+        with transaction.atomic(using='backend-test'):
+            with self.assertRaisesMessage(
+                sqlite3.OperationalError, 'database is locked'
+            ):
+                other.execute('BEGIN IMMEDIATE')
+
+    def test_retry_locked_outside_transaction(self):
+        """Вне транзакции занятая база запрашивается повторно."""
+        call, calls = locked_call(failures=2)
+        db = mock.Mock(in_transaction=False)
+        self.assertEqual(retry_locked(call, db, retries=3, backoff=0), 'ok')
+        self.assertEqual(len(calls), 3)
+
+    def test_no_retry_inside_transaction(self):
+        """Внутри транзакции ошибка блокировки не повторяется."""
+        call, calls = locked_call(failures=1)
+        db = mock.Mock(in_transaction=True)
+        with self.assertRaises(sqlite3.OperationalError):
+            retry_locked(call, db, retries=3, backoff=0)
+        self.assertEqual(len(calls), 1)
+
+    def test_replaced_file_is_unusable(self):
+        """Соединение к подменённому файлу базы считается негодным."""
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        self.assertTrue(wrapper.is_usable())
+        replacement = f'{self.path}.new'
+        sqlite3.connect(replacement).close()
+        os.replace(replacement, self.path)
+        self.assertFalse(wrapper.is_usable())
+        wrapper.close_if_unusable_or_obsolete()
+        self.assertIsNone(wrapper.connection)
@@ -0,0 +1,59 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+TEMP_STATIC_ROOT = tempfile.mkdtemp()
+CSS = 'css/bootstrap.min.css'
+
+
+@override_settings(STATIC_ROOT=TEMP_STATIC_ROOT)
+class StaticPipelineTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+
+    def test_hashed_name_and_compressed_copy(self):
+        """collectstatic пишет файл с хэшем и его сжатую копию."""
+        hashed = staticfiles_storage.stored_name(CSS)
+        self.assertNotEqual(hashed, CSS)
+        self.assertTrue(
+            os.path.isfile(os.path.join(TEMP_STATIC_ROOT, hashed + '.gz'))
+        )
+
+    def test_precompressed_immutable_response(self):
+        """Middleware отдаёт сжатую копию с Cache-Control: immutable."""
+        url = staticfiles_storage.url(CSS)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        with open(os.path.join(settings.BASE_DIR, 'static', CSS), 'rb') as f:
+            self.assertEqual(
+                gzip.decompress(b''.join(response.streaming_content)),
+                f.read()
+            )
+
+    def test_unhashed_name_is_revalidated(self):
+        """Файл без хэша в имени отдаётся целиком и без immutable."""
+        response = self.client.get(settings.STATIC_URL + CSS)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_missing_file_falls_back_to_plain_name(self):
+        """Файл не из манифеста не роняет страницу."""
+        self.assertEqual(
+            staticfiles_storage.url('css/missing.css'),
+            settings.STATIC_URL + 'css/missing.css'
+        )
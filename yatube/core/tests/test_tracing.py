@@ -0,0 +1,73 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.tracing import current_trace, traced
+from posts.models import Post, User
+
+TEMP_DIR = tempfile.mkdtemp()
+TRACE_FILE = os.path.join(TEMP_DIR, 'traces.jsonl')
+
+
+@override_settings(TRACING_FILE=TRACE_FILE)
+class TracingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='tracer')
+        Post.objects.create(author=author, text='Пост для трассы')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        if os.path.exists(TRACE_FILE):
+            os.remove(TRACE_FILE)
+
+    def test_off_by_default(self):
+        """Без выборки и Server-Timing трасса не заводится."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertFalse(os.path.exists(TRACE_FILE))
+        self.assertIsNone(current_trace())
+
+    @override_settings(TRACING_SERVER_TIMING=True)
+    def test_server_timing(self):
+        """Server-Timing содержит суммы по базе, кэшу и шаблонам."""
+        response = self.client.get(reverse('posts:index'))
+        names = [
+            part.split(';')[0].strip()
+            for part in response['Server-Timing'].split(',')
+        ]
+        for name in ('db', 'cache', 'template', 'total'):
+            self.assertIn(name, names)
+        self.assertFalse(os.path.exists(TRACE_FILE))
+
+    @override_settings(TRACING_SAMPLE_RATE=1.0)
+    def test_sampled_request_written(self):
+        """Выбранный запрос дописывается строкой JSON со спанами."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        with open(TRACE_FILE, encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(len(records), 2)
+        record = records[0]
+        self.assertEqual(record['path'], reverse('posts:index'))
+        self.assertEqual(record['status'], 200)
+        categories = {span['category'] for span in record['spans']}
+        self.assertTrue({'db', 'cache', 'template'} <= categories)
+        self.assertTrue(any(
+            'posts/index.html' in span['label']
+            for span in record['spans']
+        ))
+
+    def test_traced_without_trace(self):
+        """Вне запроса обёртка просто вызывает функцию."""
+        self.assertEqual(traced('test')(lambda value: value * 2)(21), 42)
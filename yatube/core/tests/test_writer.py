@@ -0,0 +1,111 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import writer
+from posts.cache import get_generations
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def create_group(slug):
+    return Group.objects.create(title=slug, slug=slug, description='')
+
+
+class WriterCommitTest(TestCase):
+    def test_failed_write_rolls_back_alone(self):
+        """Ошибка одной записи пачки не откатывает остальные."""
+        jobs = [
+            writer.Job(lambda: create_group('first')),
+            writer.Job(lambda: create_group('first')),
+            writer.Job(lambda: create_group('second')),
+        ]
+        writer.commit(jobs)
+        self.assertIsInstance(jobs[1].error, IntegrityError)
+        self.assertEqual(jobs[0].result.slug, 'first')
+        self.assertEqual(jobs[2].result.slug, 'second')
+        self.assertTrue(all(job.done.is_set() for job in jobs))
+        self.assertEqual(Group.objects.count(), 2)
+
+    def test_inline_without_queue(self):
+        """При WRITE_QUEUE_BATCH = 0 запись выполняется сразу."""
+        group = writer.write(create_group, 'inline')
+        self.assertEqual(Group.objects.get(slug='inline'), group)
+
+
+class WriterThreadTest(TransactionTestCase):
+    def setUp(self):
+        self.writer = writer.Writer(batch_size=8)
+        self.addCleanup(self.writer.close)
+
+    def test_concurrent_writes(self):
+        """Записи из разных потоков выполняются, ошибки доходят до них."""
+        results = {}
+
+        def submit(number):
+            try:
+                results[number] = self.writer.submit(
+                    lambda: create_group(f'group-{number % 10}')
+                ).slug
+            except IntegrityError:
+                results[number] = None
+
+        threads = [
+            threading.Thread(target=submit, args=(number,))
+            for number in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(Group.objects.count(), 10)
+        self.assertEqual(list(results.values()).count(None), 10)
+
+    @override_settings(WRITE_QUEUE_BATCH=8)
+    def test_view_writes_through_queue(self):
+        """Комментарий пишется писателем, и запрос прилипает к основной
+        базе."""
+        self.addCleanup(self.stop_process_writer)
+        user = User.objects.create_user(username='queued')
+        post = Post.objects.create(author=user, text='Пост')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Через очередь'}
+        )
+        self.assertIsNotNone(writer._writer)
+        self.assertTrue(post.comments.filter(text='Через очередь').exists())
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    @override_settings(WRITE_QUEUE_BATCH=8)
+    def test_cache_invalidated_after_commit(self):
+        """Поколение, прочитанное до фиксации пачки, после неё
+        устаревает; откаченная запись в базе не остаётся."""
+        self.addCleanup(self.stop_process_writer)
+        user = User.objects.create_user(username='queued')
+
+        def create_and_read():
+            Post.objects.create(author=user, text='Пост')
+            # Так ленту видит параллельный запрос до фиксации.
+            return get_generations(['all'])
+
+        def failing():
+            Post.objects.create(author=user, text='Откатится')
+            raise ValueError
+
+        seen = writer.write(create_and_read)
+        self.assertNotEqual(get_generations(['all']), seen)
+        with self.assertRaises(ValueError):
+            writer.write(failing)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Пост']
+        )
+
+    def stop_process_writer(self):
+        writer._writer.close()
+        writer._writer = None
@@ -0,0 +1,190 @@
+"""Трассировка запросов: SQL, кэш, миниатюры и шаблоны.
+
+TracingMiddleware заводит трассу только для запросов, попавших
+в выборку (TRACING_SAMPLE_RATE), или когда включён заголовок
+Server-Timing (TRACING_SERVER_TIMING). Без трассы обёртки сводятся
+к одному чтению contextvar, а обёртка курсоров не ставится вовсе.
+
+Трасса суммирует время по категориям для Server-Timing, а выбранные
+запросы дописываются строкой JSON в TRACING_FILE.
+"""
+import json
+import os
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+from django.utils.module_loading import import_string
+
+CACHE_METHODS = (
+    'get', 'get_many', 'set', 'set_many', 'add', 'incr',
+    'delete', 'delete_many', 'touch', 'has_key',
+)
+THUMBNAIL_METHODS = ('get_thumbnail', 'cached_thumbnail')
+# Сколько символов запроса или имени сохранять в спане.
+LABEL_LENGTH = 200
+
+_current = ContextVar('trace', default=None)
+_write_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, keep_spans):
+        self.started = time.perf_counter()
+        self.keep_spans = keep_spans
+        self.spans = []
+        self.totals = {}
+        self.counts = {}
+        self._depth = {}
+
+    @contextmanager
+    def span(self, category, label):
+        start = time.perf_counter()
+        depth = self._depth.get(category, 0)
+        self._depth[category] = depth + 1
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self._depth[category] = depth
+            self.counts[category] = self.counts.get(category, 0) + 1
+            if depth == 0:
+                # Вложенные спаны той же категории (include в шаблоне,
+                # set внутри set_many) уже учтены во внешнем.
+                self.totals[category] = (
+                    self.totals.get(category, 0.0) + duration
+                )
+            if self.keep_spans:
+                self.spans.append({
+                    'category': category,
+                    'label': str(label)[:LABEL_LENGTH],
+                    'start_ms': round((start - self.started) * 1e3, 3),
+                    'duration_ms': round(duration * 1e3, 3),
+                })
+
+    def server_timing(self, total):
+        parts = [
+            '{};dur={:.1f};desc="{} calls"'.format(
+                category, self.totals[category] * 1e3, self.counts[category]
+            )
+            for category in sorted(self.totals)
+        ]
+        parts.append('total;dur={:.1f}'.format(total * 1e3))
+        return ', '.join(parts)
+
+
+def current_trace():
+    return _current.get()
+
+
+def traced(category, label=None):
+    """Оборачивает функцию в спан, если у запроса есть трасса."""
+    def decorator(func):
+        name = label or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            with trace.span(category, name):
+                return func(*args, **kwargs)
+        wrapper.__traced__ = True
+        return wrapper
+    return decorator
+
+
+def _trace_methods(cls, names, category):
+    for name in names:
+        method = getattr(cls, name, None)
+        if method is None or getattr(method, '__traced__', False):
+            continue
+        setattr(
+            cls, name,
+            traced(category, f'{cls.__name__}.{name}')(method)
+        )
+
+
+def _traced_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        trace = _current.get()
+        if trace is None:
+            return render(self, context)
+        with trace.span('template', self.name or '<string>'):
+            return render(self, context)
+    wrapper.__traced__ = True
+    return wrapper
+
+
+def install():
+    """Ставит обёртки на кэш, бэкенд миниатюр и рендеринг шаблонов."""
+    for options in settings.CACHES.values():
+        _trace_methods(
+            import_string(options['BACKEND']), CACHE_METHODS, 'cache'
+        )
+    backend = getattr(settings, 'THUMBNAIL_BACKEND', None)
+    if backend:
+        _trace_methods(import_string(backend), THUMBNAIL_METHODS, 'thumbnail')
+    if not getattr(Template.render, '__traced__', False):
+        Template.render = _traced_render(Template.render)
+
+
+def _db_span(execute, sql, params, many, context):
+    with _current.get().span('db', sql):
+        return execute(sql, params, many, context)
+
+
+def write_trace(request, response, trace, total):
+    record = {
+        'time': time.time(),
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(total * 1e3, 3),
+        'totals_ms': {
+            category: round(value * 1e3, 3)
+            for category, value in trace.totals.items()
+        },
+        'spans': trace.spans,
+    }
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    directory = os.path.dirname(settings.TRACING_FILE)
+    with _write_lock:
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(settings.TRACING_FILE, 'a', encoding='utf-8') as file:
+            file.write(line)
+
+
+class TracingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sampled = random.random() < settings.TRACING_SAMPLE_RATE
+        if not sampled and not settings.TRACING_SERVER_TIMING:
+            return self.get_response(request)
+        trace = Trace(keep_spans=sampled)
+        token = _current.set(trace)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(_db_span)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - trace.started
+        if settings.TRACING_SERVER_TIMING:
+            response['Server-Timing'] = trace.server_timing(total)
+        if sampled:
+            write_trace(request, response, trace, total)
+        return response
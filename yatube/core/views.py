@@ -1,4 +1,18 @@
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+
+from .files import serve_file
+
+# Загруженные файлы не перезаписываются (storage подбирает новое имя),
+# а миниатюры sorl лежат под именами-хэшами.
+MEDIA_CACHE_CONTROL = 'public, max-age=604800'
 
 
 def page_not_found(request, exception):
@@ -18,3 +32,23 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@require_safe
+def media(request, path):
+    """Отдаёт файл из MEDIA_ROOT или передаёт его отдачу nginx."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    if settings.MEDIA_ACCEL_REDIRECT:
+        response = HttpResponse()
+        # Тип файла определит nginx по внутренней location.
+        del response['Content-Type']
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_REDIRECT + quote(path)
+        )
+        return response
+    return serve_file(request, full_path, cache_control=MEDIA_CACHE_CONTROL)
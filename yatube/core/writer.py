@@ -0,0 +1,166 @@
+"""Единственный писатель в SQLite на процесс.
+
+write(call) выполняет call() — сохранение формы, создание подписки —
+в потоке-писателе процесса и возвращает её результат или поднимает
+её исключение в вызывающем потоке. Писатель забирает из очереди всё,
+что накопилось, до WRITE_QUEUE_BATCH записей и выполняет их в одной
+транзакции, каждую в своей точке сохранения: ошибка одной записи
+откатывает только её. Транзакция и точки сохранения открываются
+во всех базах, куда пишут представления, — основной и на шардах
+постов (POST_SHARDS), так что неудачная запись откатывается везде.
+Базы фиксируются по очереди, основная последней, а не двухфазно.
+Чем больше параллельных запросов, тем крупнее пачки, и база видит
+одну транзакцию вместо борьбы за блокировку.
+
+Ответ возвращается после фиксации пачки и её on_commit-обработчиков,
+так что после write() запрос читает свою запись. Записи выполняются
+в контексте (contextvars) вызвавшего запроса: роутер реплик видит,
+что запрос писал. Их SQL не попадает в бюджет запросов представления.
+
+Внутри уже открытой транзакции и при WRITE_QUEUE_BATCH = 0 запись
+выполняется сразу в вызывающем потоке: писатель не увидел бы
+незафиксированных данных вызывающего.
+"""
+import contextvars
+import logging
+import os
+import queue
+import threading
+from contextlib import ExitStack, contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    close_old_connections,
+    connections,
+    transaction
+)
+
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_lock = threading.Lock()
+# Знак потоку-писателю остановиться.
+_STOP = object()
+
+
+class WriteTimeout(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, call):
+        self.call = call
+        self.context = contextvars.copy_context()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def run(self):
+        return self.context.run(self.call)
+
+
+def databases():
+    """Основная база и шарды постов, на которые пишут представления."""
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *settings.POST_SHARDS]))
+
+
+@contextmanager
+def atomic(using):
+    """transaction.atomic сразу в нескольких базах."""
+    with ExitStack() as stack:
+        for alias in using:
+            stack.enter_context(transaction.atomic(using=alias))
+        yield
+
+
+def commit(jobs, using=None):
+    """Выполняет записи одной транзакцией, каждую в точке сохранения."""
+    using = using or databases()
+    try:
+        with atomic(using):
+            for job in jobs:
+                try:
+                    with atomic(using):
+                        job.result = job.run()
+                except Exception as error:
+                    job.error = error
+    except Exception as error:
+        logger.exception('Не удалось зафиксировать пачку записей')
+        for job in jobs:
+            if job.error is None:
+                job.error = error
+    finally:
+        for job in jobs:
+            job.done.set()
+
+
+class Writer:
+    def __init__(self, using=None, batch_size=64):
+        self.using = using or databases()
+        self.batch_size = batch_size
+        self.pid = os.getpid()
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(
+            target=self.loop, name='db-writer', daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, call, timeout=None):
+        job = Job(call)
+        self.queue.put(job)
+        if not job.done.wait(timeout):
+            # Запись всё ещё может зафиксироваться позже.
+            raise WriteTimeout(f'Запись не выполнена за {timeout} с')
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def loop(self):
+        try:
+            while True:
+                batch = [self.queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                jobs = [job for job in batch if job is not _STOP]
+                if jobs:
+                    close_old_connections()
+                    commit(jobs, self.using)
+                if len(jobs) < len(batch):
+                    return
+        finally:
+            for alias in self.using:
+                connections[alias].close()
+
+    def close(self):
+        self.queue.put(_STOP)
+        self.thread.join()
+
+
+def _get_writer():
+    global _writer
+    with _lock:
+        # После fork поток-писатель родителя в дочернем процессе не живёт.
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = Writer(batch_size=settings.WRITE_QUEUE_BATCH)
+        return _writer
+
+
+@traced('db', 'очередь записи')
+def write(call, *args, **kwargs):
+    """Выполняет call(*args, **kwargs) через писателя процесса."""
+    if args or kwargs:
+        call = partial(call, *args, **kwargs)
+    using = databases()
+    if not settings.WRITE_QUEUE_BATCH or any(
+        connections[alias].in_atomic_block for alias in using
+    ):
+        with atomic(using):
+            return call()
+    return _get_writer().submit(call, settings.WRITE_QUEUE_TIMEOUT)
@@ -1,10 +1,185 @@
+from django import forms
 from django.conf import settings
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count, F
+from django.utils.functional import cached_property
 
+from . import counters, search, sharding
+from .cache import bump_generations
 from .models import Group, Post, Comment, Follow
 
 
-class PostAdmin(admin.ModelAdmin):
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор списков админки без точного COUNT(*) по всей таблице.
+
+    Для списка без фильтров число строк берётся из статистики
+    SQLite (sqlite_stat1, её собирает ANALYZE). Иначе строки
+    считаются не дальше ADMIN_COUNT_LIMIT: дальних страниц
+    в админке всё равно никто не листает.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.table_estimate(queryset)
+            if estimate is not None:
+                return estimate
+        return queryset.order_by().values('pk')[
+            :settings.ADMIN_COUNT_LIMIT
+        ].count()
+
+    @staticmethod
+    def table_estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'sqlite':
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    (queryset.model._meta.db_table,)
+                )
+                row = cursor.fetchone()
+        except DatabaseError:
+            return None
+        return int(row[0].split()[0]) if row else None
+
+
+class FullTextSearchMixin:
+    """Поиск в админке по индексу FTS5 вместо LIKE по всей таблице."""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return search.filter_matching(queryset, search_term), False
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = settings.EMPTY_VALUE_DISPLAY
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Выбор шарда в списке; без шардирования фильтра не видно.
+
+    Сама выборка привязывается к шарду в ShardedAdmin.get_queryset.
+    """
+
+    title = 'шард'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        if not sharding.is_sharded():
+            return []
+        return [(alias, alias) for alias in sharding.shards()]
+
+    def queryset(self, request, queryset):
+        return queryset
+
+    def choices(self, changelist):
+        # Пункта «Все» нет: список показывает один шард за раз.
+        selected = selected_shard(changelist.params)
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == selected,
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: alias}
+                ),
+                'display': title,
+            }
+
+
+def selected_shard(params):
+    alias = params.get(ShardFilter.parameter_name)
+    return alias if alias in sharding.shards() else sharding.shards()[0]
+
+
+def object_shard(model, object_id):
+    """Шард, на котором лежит объект; если его нет — первый шард."""
+    if not sharding.is_sharded():
+        return sharding.shards()[0]
+    try:
+        object_id = int(object_id)
+    except (TypeError, ValueError):
+        return sharding.shards()[0]
+    if model is Post:
+        return sharding.locate(object_id)
+    for alias in sharding.shards():
+        if model._base_manager.using(alias).filter(pk=object_id).exists():
+            return alias
+    return sharding.shards()[0]
+
+
+def admin_shard(request):
+    return getattr(request, 'admin_shard', None) or sharding.shards()[0]
+
+
+class ShardedAdmin(ScalableAdmin):
+    """Админка постов и комментариев, которые лежат на шардах.
+
+    Список показывает один шард (ShardFilter), страница объекта
+    открывается на шарде, где объект лежит. Выборки привязываются
+    к шарду явно, через .using(): шаблон выполняет их уже после
+    выхода из представления. Без шардирования это основная база:
+    админка правит данные и реплики не читает.
+    """
+
+    def get_list_filter(self, request):
+        return (ShardFilter, *super().get_list_filter(request))
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).using(admin_shard(request))
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.related_model._meta.label_lower in (
+            sharding.SHARDED_MODELS
+        ):
+            kwargs['using'] = admin_shard(request)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def add_shard(self, request):
+        """Шард нового объекта; у поста его выбирает роутер по автору."""
+        return sharding.shards()[0]
+
+    def changelist_view(self, request, extra_context=None):
+        request.admin_shard = selected_shard(request.GET)
+        return super().changelist_view(request, extra_context)
+
+    def changeform_view(self, request, object_id=None, form_url='',
+                        extra_context=None):
+        if object_id is None:
+            request.admin_shard = self.add_shard(request)
+        else:
+            request.admin_shard = object_shard(self.model, object_id)
+        return super().changeform_view(
+            request, object_id, form_url, extra_context
+        )
+
+    def delete_view(self, request, object_id, extra_context=None):
+        request.admin_shard = object_shard(self.model, object_id)
+        return super().delete_view(request, object_id, extra_context)
+
+    def history_view(self, request, object_id, extra_context=None):
+        request.admin_shard = object_shard(self.model, object_id)
+        return super().history_view(request, object_id, extra_context)
+
+
+class MoveToGroupForm(ActionForm):
+    group = forms.ModelChoiceField(
+        queryset=Group.objects.all(),
+        required=False,
+        label='Группа'
+    )
+
+
+class PostAdmin(FullTextSearchMixin, ShardedAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,10 +187,55 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group'
     )
-    list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
-    empty_value_display = settings.EMPTY_VALUE_DISPLAY
+    date_hierarchy = 'pub_date'
+    action_form = MoveToGroupForm
+    actions = ('move_to_group',)
+
+    def move_to_group(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        group = form.cleaned_data['group'] if form.is_valid() else None
+        if group is None:
+            self.message_user(
+                request, 'Выберите группу для переноса.', messages.WARNING
+            )
+            return
+        # Посты выбраны на одном шарде, счётчики групп — в основной базе.
+        with transaction.atomic(), transaction.atomic(using=queryset.db):
+            moved = dict(
+                queryset.order_by().values_list('group_id').annotate(
+                    Count('id')
+                )
+            )
+            authors = set(
+                queryset.order_by().values_list(
+                    'author__username', flat=True
+                ).distinct()
+            )
+            # update() идёт мимо сигналов: версию, по которой строятся
+            # ETag поста, поднимаем сами, как post_edited.
+            updated = queryset.update(
+                group=group, version=F('version') + 1
+            )
+            counters.posts_moved(moved, group.pk)
+        # Ленты старых групп, новой, авторов и главная.
+        slugs = Group.objects.filter(
+            pk__in=[*moved, group.pk]
+        ).values_list('slug', flat=True)
+        bump_generations([
+            'all',
+            *(f'author:{username}' for username in authors),
+            *(f'group:{slug}' for slug in slugs),
+        ])
+        self.message_user(
+            request, f'Перенесено постов в «{group}»: {updated}.'
+        )
+
+    move_to_group.short_description = 'Перенести в группу'
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -24,7 +244,7 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = settings.EMPTY_VALUE_DISPLAY
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, ShardedAdmin):
     list_display = (
         'pk',
         'text',
@@ -32,16 +252,23 @@ class CommentAdmin(admin.ModelAdmin):
         'post',
         'author',
     )
-    search_fields = ('text', 'post',)
-    list_filter = ('created', 'author')
-    empty_value_display = settings.EMPTY_VALUE_DISPLAY
+    list_select_related = ('post', 'author')
+    raw_id_fields = ('post', 'author')
+    search_fields = ('text',)
+    list_filter = ('created',)
+    date_hierarchy = 'created'
 
+    def add_shard(self, request):
+        # Комментарий пишется на шард своего поста.
+        post_id = request.POST.get('post') or request.GET.get('post')
+        return object_shard(Post, post_id)
 
-class FollowAdmin(admin.ModelAdmin):
+
+class FollowAdmin(ScalableAdmin):
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user',)
-    list_filter = ('author',)
-    empty_value_display = settings.EMPTY_VALUE_DISPLAY
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
 
 
 admin.site.register(Post, PostAdmin)
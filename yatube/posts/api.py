@@ -0,0 +1,170 @@
+"""JSON API только для чтения: ленты, посты и комментарии.
+
+Страницы собираются из values(), без объектов моделей и шаблонов,
+и листаются теми же курсорами, что и HTML-ленты. Каждый ответ
+несёт валидаторы из posts.conditional, так что 304 на
+неизменившуюся страницу отдаётся без выборки самих строк.
+
+Id отдаются строками: Snowflake-id (core.snowflake) больше 2 ** 53,
+и JavaScript округлил бы их как числа. Курсоры — и так строки.
+"""
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+
+from .cache import get_generations
+from .conditional import feed_condition, make_etag, post_condition
+from .following import followed_ids
+from .models import Comment, Group, Post, User
+from .sharding import post_shard
+from .timeline import follow_paginator
+from .utils import (
+    COMMENT_ORDERING,
+    CursorPaginator,
+    feed_paginator,
+    paginate
+)
+
+FEED_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'author__username',
+    'group__slug',
+    'image',
+)
+# Число комментариев меняется без смены поколений лент, из которых
+# собран ETag ленты, поэтому оно есть только у отдельного поста:
+# его валидаторы комментарии учитывают.
+POST_FIELDS = (*FEED_FIELDS, 'comments_count')
+COMMENT_FIELDS = ('id', 'text', 'created', 'author__username')
+
+image_storage = Post._meta.get_field('image').storage
+
+
+def post_row(row):
+    data = {
+        'id': str(row['id']),
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+        'group': row['group__slug'],
+        'image': image_storage.url(row['image']) if row['image'] else None,
+    }
+    if 'comments_count' in row:
+        data['comments_count'] = row['comments_count']
+    return data
+
+
+def comment_row(row):
+    return {
+        'id': str(row['id']),
+        'text': row['text'],
+        'created': row['created'],
+        'author': row['author__username'],
+    }
+
+
+def page_response(request, page, serialize):
+    def link(name, cursor):
+        if cursor is None:
+            return None
+        return request.build_absolute_uri(f'{request.path}?{name}={cursor}')
+
+    return JsonResponse({
+        'results': [serialize(row) for row in page],
+        'next': link('after', page.next_cursor),
+        'previous': link('before', page.previous_cursor),
+    })
+
+
+def follow_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    return make_etag(
+        request.get_full_path(),
+        request.user.pk,
+        *get_generations(['all']),
+        followed_ids(request.user).tobytes().hex()
+    )
+
+
+def feed_page(request, posts):
+    return page_response(
+        request,
+        paginate(
+            request,
+            feed_paginator(
+                posts.values(*FEED_FIELDS), settings.POSTS_PER_PAGE
+            )
+        ),
+        post_row
+    )
+
+
+@require_safe
+@feed_condition(lambda: ['all'], per_user=False)
+def index(request):
+    return feed_page(request, Post.objects.all())
+
+
+@require_safe
+@feed_condition(lambda slug: [f'group:{slug}'], per_user=False)
+def group_posts(request, slug):
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return feed_page(request, Post.objects.filter(group=group))
+
+
+@require_safe
+@feed_condition(
+    lambda username: [f'author:{username}'], per_user=False
+)
+def profile(request, username):
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return feed_page(request, author.posts.all())
+
+
+@require_safe
+@condition(etag_func=follow_etag)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Нужна авторизация.'}, status=401
+        )
+    response = page_response(
+        request,
+        paginate(request, follow_paginator(request.user, FEED_FIELDS)),
+        post_row
+    )
+    response['Cache-Control'] = 'private'
+    return response
+
+
+@require_safe
+@post_shard
+@post_condition(per_user=False)
+def post_detail(request, post_id):
+    post = Post.objects.filter(pk=post_id).values(*POST_FIELDS).first()
+    if post is None:
+        raise Http404
+    return JsonResponse(post_row(post))
+
+
+@require_safe
+@post_shard
+@post_condition(per_user=False)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    comments = Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS)
+    return page_response(
+        request,
+        paginate(
+            request,
+            CursorPaginator(
+                comments, settings.COMMENTS_PER_PAGE, COMMENT_ORDERING
+            )
+        ),
+        comment_row
+    )
@@ -0,0 +1,139 @@
+"""Кэш лент и фрагментов постов.
+
+Страницы лент кэшируются надолго, а свежесть обеспечивают счётчики
+поколений: общий для главной, по группе и по автору. Запись поста
+увеличивает поколения затронутых лент, и следующие запросы идут
+по новым ключам, не дожидаясь истечения старых.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Group
+
+# На странице профиля карточка рисуется без строки с автором.
+CARD_VARIANTS = ('feed', 'profile')
+
+
+def card_key(post, variant):
+    """Ключ карточки поста.
+
+    Кроме версии правки и группы поста ключ включает отпечаток того,
+    что карточка показывает об авторе и группе: их переименование
+    тоже уводит карточку из кэша.
+    """
+    group = post.group
+    shown = '\0'.join([
+        post.author.username,
+        post.author.get_full_name(),
+        group.slug if group else '',
+        group.title if group else '',
+    ])
+    names = hashlib.md5(shown.encode()).hexdigest()[:12]
+    return (
+        f'post_card:{post.pk}:{post.version}:{post.group_id}:'
+        f'{names}:{variant}'
+    )
+
+
+def card_keys(post):
+    return [card_key(post, variant) for variant in CARD_VARIANTS]
+
+
+def generation_key(scope):
+    return f'feed_generation:{scope}'
+
+
+def _fresh_generation():
+    # Поколение, вытесненное из кэша, начинается заново не с единицы,
+    # а со значения, которого ещё не было, иначе ожили бы старые страницы.
+    return time.time_ns()
+
+
+def get_generations(scopes):
+    keys = [generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    missed = {
+        key: _fresh_generation() for key in keys if key not in generations
+    }
+    if missed:
+        cache.set_many(missed, None)
+        generations.update(missed)
+    return [generations[key] for key in keys]
+
+
+def modified_key(scope):
+    return f'feed_modified:{scope}'
+
+
+def bump_generations(scopes):
+    for scope in scopes:
+        key = generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_generation(), None)
+    now = time.time()
+    cache.set_many({modified_key(scope): now for scope in scopes}, None)
+
+
+def get_last_modified(scopes):
+    """Время последней смены поколений scopes или None, если неизвестно."""
+    modified = cache.get_many([modified_key(scope) for scope in scopes])
+    if not modified or len(modified) < len(scopes):
+        return None
+    return max(modified.values())
+
+
+def post_scopes(post, *group_ids):
+    """Ленты, в которых виден пост: главная, автор и его группы."""
+    slugs = Group.objects.filter(
+        pk__in=[group_id for group_id in group_ids if group_id is not None]
+    ).values_list('slug', flat=True)
+    return [
+        'all',
+        f'author:{post.author.username}',
+        *(f'group:{slug}' for slug in slugs)
+    ]
+
+
+def feed_cache(scopes, timeout=None):
+    """Кэширует GET-ответы ленты до смены поколения её областей.
+
+    scopes(**kwargs) по аргументам представления возвращает области,
+    от которых зависит страница. Ключ учитывает пользователя, потому
+    что шапка и кнопки подписки у каждого свои.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            names = scopes(**kwargs)
+            generations = get_generations(names)
+            url = hashlib.md5(
+                request.get_full_path().encode()
+            ).hexdigest()
+            key = 'feed_page:{}:{}:{}'.format(
+                ':'.join(
+                    f'{name}={generation}'
+                    for name, generation in zip(names, generations)
+                ),
+                request.user.pk or 0,
+                url
+            )
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(
+                        key,
+                        response,
+                        timeout or settings.FEED_CACHE_TIMEOUT
+                    )
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,108 @@
+"""Валидаторы для условных GET-запросов (ETag и Last-Modified).
+
+Валидаторы считаются без рендеринга и почти без базы: ленты берут
+их из поколений кэша, пост — из своей версии, счётчика комментариев
+и последнего комментария. Страницы с шапкой пользователя получают
+в ETag его id, поэтому у каждого пользователя свой вариант.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from django.views.decorators.http import condition
+
+from .cache import get_generations, get_last_modified
+from .models import Comment, Post
+from .utils import COMMENT_ORDERING
+
+
+def make_etag(*parts):
+    raw = ':'.join(str(part) for part in parts)
+    return '"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def _user_part(request, per_user):
+    return request.user.pk or 0 if per_user else ''
+
+
+def _remember(request, name, load):
+    # etag_func и last_modified_func вызываются по очереди, а данные
+    # у них общие: второй раз в базу не ходим.
+    if not hasattr(request, name):
+        setattr(request, name, load())
+    return getattr(request, name)
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+def feed_condition(scopes, per_user=True):
+    """condition() для ленты, зависящей от поколений scopes(**kwargs)."""
+    def etag(request, *args, **kwargs):
+        return make_etag(
+            request.get_full_path(),
+            _user_part(request, per_user),
+            *get_generations(scopes(**kwargs))
+        )
+
+    def last_modified(request, *args, **kwargs):
+        modified = get_last_modified(scopes(**kwargs))
+        return _timestamp(modified) if modified else None
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def post_state(request, post_id):
+    """Версия поста, его ленты и последний комментарий или None."""
+    def load():
+        state = Post.objects.filter(pk=post_id).values_list(
+            'version', 'comments_count', 'author__username', 'group__slug'
+        ).first()
+        if state is None:
+            return None
+        version, comments_count, username, slug = state
+        scopes = [f'author:{username}']
+        if slug:
+            scopes.append(f'group:{slug}')
+        newest_id, newest_created = Comment.objects.filter(
+            post_id=post_id
+        ).order_by(*COMMENT_ORDERING).values_list(
+            'id', 'created'
+        ).first() or (None, None)
+        # Правка поста меняет поколение его автора, новый комментарий —
+        # нет, поэтому берётся более позднее из двух времён.
+        modified = get_last_modified(scopes)
+        if modified is not None:
+            modified = _timestamp(modified)
+            if newest_created is not None:
+                modified = max(modified, newest_created)
+        return {
+            'version': version,
+            'comments_count': comments_count,
+            'newest_comment': newest_id,
+            'generations': get_generations(scopes),
+            'modified': modified,
+        }
+    return _remember(request, f'_post_state_{post_id}', load)
+
+
+def post_condition(per_user=True):
+    """condition() для страницы поста и его комментариев."""
+    def etag(request, post_id):
+        state = post_state(request, post_id)
+        if state is None:
+            return None
+        return make_etag(
+            request.get_full_path(),
+            _user_part(request, per_user),
+            state['version'],
+            state['comments_count'],
+            state['newest_comment'],
+            *state['generations']
+        )
+
+    def last_modified(request, post_id):
+        state = post_state(request, post_id)
+        return state and state['modified']
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
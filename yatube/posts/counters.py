@@ -0,0 +1,178 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Счётчики меняются атомарно F-выражениями в тех же путях записи,
+что и сами объекты, поэтому страницам не нужен COUNT(*).
+Расхождения исправляет команда reconcile_counters.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from . import sharding
+from .models import Follow, Group, Post, User, UserCounter
+
+
+def _update(queryset, **deltas):
+    """Атомарно прибавляет deltas, не опуская счётчики ниже нуля."""
+    guards = {
+        f'{name}__gte': -delta for name, delta in deltas.items() if delta < 0
+    }
+    return queryset.filter(**guards).update(
+        **{name: F(name) + delta for name, delta in deltas.items()}
+    )
+
+
+def bump_user(user_id, **deltas):
+    """Меняет счётчики пользователя, создавая строку при первом приращении."""
+    counters = UserCounter.objects.filter(user_id=user_id)
+    if _update(counters, **deltas) or min(deltas.values()) < 0:
+        return
+    # Одна вставка INSERT OR IGNORE вместо SELECT и INSERT в точке
+    # сохранения, как у get_or_create.
+    UserCounter.objects.bulk_create(
+        [UserCounter(user_id=user_id)], ignore_conflicts=True
+    )
+    _update(counters, **deltas)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _update(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def bump_post(post_id, delta, using=None):
+    _update(
+        Post.objects.using(using).filter(pk=post_id), comments_count=delta
+    )
+
+
+def post_created(post):
+    bump_user(post.author_id, posts_count=1)
+    bump_group(post.group_id, 1)
+
+
+def post_moved(old_group_id, new_group_id):
+    if old_group_id != new_group_id:
+        bump_group(old_group_id, -1)
+        bump_group(new_group_id, 1)
+
+
+def posts_moved(moved, new_group_id):
+    """moved — сколько постов перенесено из каждой старой группы."""
+    for old_group_id, count in moved.items():
+        if old_group_id != new_group_id:
+            bump_group(old_group_id, -count)
+            bump_group(new_group_id, count)
+
+
+def post_deleted(post):
+    bump_user(post.author_id, posts_count=-1)
+    bump_group(post.group_id, -1)
+
+
+def follow_changed(follow, delta):
+    bump_user(follow.author_id, followers_count=delta)
+    bump_user(follow.user_id, following_count=delta)
+
+
+def reconcile_users(first_id, last_id):
+    """Пересчитывает счётчики пользователей с id из [first_id, last_id]."""
+    def between(field):
+        return {f'{field}__gte': first_id, f'{field}__lte': last_id}
+
+    actual = {
+        user_id: [0, 0, 0]
+        for user_id in User.objects.filter(
+            **between('id')
+        ).values_list('id', flat=True)
+    }
+    sources = (
+        [
+            Post.objects.using(alias).filter(
+                **between('author_id')
+            ).values_list('author_id')
+            for alias in sharding.aliases()
+        ],
+        [Follow.objects.filter(**between('author_id')).values_list(
+            'author_id'
+        )],
+        [Follow.objects.filter(**between('user_id')).values_list(
+            'user_id'
+        )],
+    )
+    for index, querysets in enumerate(sources):
+        for queryset in querysets:
+            grouped = queryset.order_by().annotate(count=Count('id'))
+            for user_id, count in grouped:
+                actual[user_id][index] += count
+    stored = {
+        counter.user_id: counter
+        for counter in UserCounter.objects.filter(**between('user_id'))
+    }
+    fixed = []
+    for user_id, (posts, followers, following) in actual.items():
+        counter = stored.get(user_id) or UserCounter(user_id=user_id)
+        if (
+            counter.posts_count, counter.followers_count,
+            counter.following_count
+        ) != (posts, followers, following):
+            counter.posts_count = posts
+            counter.followers_count = followers
+            counter.following_count = following
+            fixed.append(counter)
+    with transaction.atomic():
+        UserCounter.objects.bulk_create(
+            [counter for counter in fixed if counter.user_id not in stored]
+        )
+        UserCounter.objects.bulk_update(
+            [counter for counter in fixed if counter.user_id in stored],
+            ('posts_count', 'followers_count', 'following_count')
+        )
+    return len(fixed)
+
+
+def _fix(queryset, field, drifted):
+    with transaction.atomic(using=queryset.db):
+        for pk, actual in drifted:
+            queryset.model.objects.using(queryset.db).filter(
+                pk=pk
+            ).update(**{field: actual})
+    return len(drifted)
+
+
+def _reconcile(queryset, field, related):
+    drifted = list(
+        queryset.annotate(actual=Count(related)).exclude(
+            **{field: F('actual')}
+        ).values_list('pk', 'actual')
+    )
+    return _fix(queryset, field, drifted)
+
+
+def reconcile_groups(first_id, last_id):
+    groups = Group.objects.filter(id__range=(first_id, last_id))
+    if not sharding.is_sharded():
+        return _reconcile(groups, 'posts_count', 'posts')
+    # Посты группы разбросаны по шардам: считаем на каждом и складываем.
+    actual = Counter()
+    for alias in sharding.shards():
+        actual.update(dict(
+            Post.objects.using(alias).filter(
+                group_id__gte=first_id, group_id__lte=last_id
+            ).order_by().values_list('group_id').annotate(count=Count('id'))
+        ))
+    drifted = [
+        (pk, actual[pk])
+        for pk, stored in groups.values_list('pk', 'posts_count')
+        if stored != actual[pk]
+    ]
+    return _fix(groups, 'posts_count', drifted)
+
+
+def reconcile_posts(first_id, last_id):
+    return _reconcile(
+        Post.objects.filter(id__range=(first_id, last_id)),
+        'comments_count',
+        'comments'
+    )
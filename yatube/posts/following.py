@@ -0,0 +1,82 @@
+"""Кэш множества авторов, на которых подписан пользователь.
+
+Множество хранится в кэше как отсортированный массив 64-битных id
+(8 байт на подписку) и загружается из базы одним запросом при
+промахе, после чего проверка «подписан ли я на X» не ходит в базу.
+Подписка и отписка не правят массив, а сбрасывают его: правка через
+get и set потеряла бы одно из двух одновременных изменений.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow
+
+TYPECODE = 'q'
+
+
+def following_key(user_id):
+    return f'following:{user_id}'
+
+
+def _load(user_id):
+    ids = array(TYPECODE, Follow.objects.filter(
+        user_id=user_id
+    ).order_by('author_id').values_list('author_id', flat=True))
+    cache.set(
+        following_key(user_id), ids.tobytes(),
+        settings.FOLLOWING_CACHE_TIMEOUT
+    )
+    return ids
+
+
+def _cached(user_id):
+    raw = cache.get(following_key(user_id))
+    if raw is None:
+        return None
+    ids = array(TYPECODE)
+    ids.frombytes(raw)
+    return ids
+
+
+def followed_ids(user):
+    """Отсортированный массив id авторов, на которых подписан user.
+
+    В пределах запроса массив запоминается на объекте пользователя.
+    """
+    if not user.is_authenticated:
+        return array(TYPECODE)
+    if not hasattr(user, '_followed_ids'):
+        ids = _cached(user.pk)
+        user._followed_ids = ids if ids is not None else _load(user.pk)
+    return user._followed_ids
+
+
+def _contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following(user, author_id):
+    return _contains(followed_ids(user), author_id)
+
+
+def following_among(user, author_ids):
+    """Те из author_ids, на кого подписан user."""
+    ids = followed_ids(user)
+    return {author_id for author_id in author_ids if _contains(ids, author_id)}
+
+
+def forget(user_id):
+    """Сбрасывает массив: он загрузится заново при следующем обращении."""
+    cache.delete(following_key(user_id))
+
+
+def followed(follow):
+    forget(follow.user_id)
+
+
+def unfollowed(follow):
+    forget(follow.user_id)
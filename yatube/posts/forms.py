@@ -29,3 +29,7 @@ class CommentForm(forms.ModelForm):
                 'Это поле не может быть пустым'
             )
         return data
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200)
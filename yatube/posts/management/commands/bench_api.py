@@ -0,0 +1,98 @@
+import re
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+User = get_user_model()
+
+NEXT_LINK = re.compile(r'href="\?after=([\w-]+)"')
+
+# Без кэша каждая страница действительно собирается заново.
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность HTML-лент и JSON API, '
+        'пролистывая ленты курсором по текущей базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=50,
+            help='Сколько страниц каждой ленты пролистать.'
+        )
+        parser.add_argument(
+            '--user',
+            help='Пользователь для ленты подписок (по умолчанию — без неё).'
+        )
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help='Не отключать кэш страниц и карточек.'
+        )
+
+    def handle(self, *args, pages, user, with_cache, **options):
+        client = Client(SERVER_NAME=settings.ALLOWED_HOSTS[0])
+        feeds = [('index', reverse('posts:index'), reverse('posts:api_index'))]
+        if user:
+            try:
+                client.force_login(User.objects.get(username=user))
+            except User.DoesNotExist:
+                raise CommandError(f'Нет пользователя {user}')
+            feeds.append((
+                'follow',
+                reverse('posts:follow_index'),
+                reverse('posts:api_follow_index')
+            ))
+        caches = settings.CACHES if with_cache else NO_CACHE
+        with override_settings(CACHES=caches):
+            for name, html_url, api_url in feeds:
+                self.report(
+                    name, 'HTML', self.walk_html(client, html_url, pages)
+                )
+                self.report(
+                    name, 'API', self.walk_api(client, api_url, pages)
+                )
+
+    def walk_html(self, client, url, pages):
+        timings = []
+        for _ in range(pages):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            found = NEXT_LINK.search(response.content.decode())
+            if found is None:
+                break
+            url = f'{url.split("?")[0]}?after={found.group(1)}'
+        return timings
+
+    def walk_api(self, client, url, pages):
+        timings = []
+        for _ in range(pages):
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - started)
+            url = response.json()['next']
+            if url is None:
+                break
+        return timings
+
+    def report(self, feed, kind, timings):
+        total = sum(timings)
+        self.stdout.write(
+            '{:<7} {:<5} страниц {:4d}  {:8.1f} стр/с  '
+            'в среднем {:7.2f} мс'.format(
+                feed,
+                kind,
+                len(timings),
+                len(timings) / total if total else 0,
+                total / len(timings) * 1e3 if timings else 0
+            )
+        )
@@ -0,0 +1,92 @@
+import random
+import sqlite3
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.search import TOKENIZE, match_expression
+
+SYLLABLES = (
+    'ка', 'ро', 'ми', 'на', 'то', 'ле', 'ву', 'са', 'ди', 'по',
+    'ры', 'же', 'ло', 'ту', 'без', 'вер', 'гор', 'дом', 'лес', 'мор',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск по тексту постов через LIKE и через индекс FTS5 '
+        'на синтетическом наборе постов во временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--words', type=int, default=60,
+                            help='Слов в одном посте.')
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, posts, words, queries, seed, **options):
+        generator = random.Random(seed)
+        vocabulary = [
+            ''.join(generator.choices(SYLLABLES, k=generator.randint(2, 4)))
+            for _ in range(20000)
+        ]
+        db = sqlite3.connect(':memory:')
+        db.executescript(f"""
+            CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT NOT NULL);
+            CREATE VIRTUAL TABLE post_fts USING fts5(
+                text, content='post', content_rowid='id',
+                tokenize='{TOKENIZE}'
+            );
+        """)
+        started = time.perf_counter()
+        db.executemany(
+            'INSERT INTO post (text) VALUES (?)',
+            (
+                (' '.join(generator.choices(vocabulary, k=words)),)
+                for _ in range(posts)
+            )
+        )
+        filled = time.perf_counter()
+        db.execute("INSERT INTO post_fts (post_fts) VALUES ('rebuild')")
+        indexed = time.perf_counter()
+        self.stdout.write(
+            f'{posts} постов: вставка {filled - started:.1f} с, '
+            f'построение индекса {indexed - filled:.1f} с'
+        )
+        terms = generator.sample(vocabulary, queries)
+        self.report('LIKE', [
+            self.measure(
+                db,
+                'SELECT id FROM post WHERE text LIKE ? '
+                'ORDER BY id DESC LIMIT 10',
+                (f'%{term}%',)
+            )
+            for term in terms
+        ])
+        self.report('FTS5', [
+            self.measure(
+                db,
+                'SELECT rowid FROM post_fts WHERE post_fts MATCH ? '
+                'ORDER BY rank LIMIT 10',
+                (match_expression(term),)
+            )
+            for term in terms
+        ])
+
+    def measure(self, db, sql, params):
+        started = time.perf_counter()
+        db.execute(sql, params).fetchall()
+        return time.perf_counter() - started
+
+    def report(self, name, samples):
+        samples.sort()
+        self.stdout.write(
+            '{:<5} p50 {:9.2f} мс  p99 {:9.2f} мс  среднее {:9.2f} мс'.format(
+                name,
+                samples[len(samples) // 2] * 1e3,
+                samples[int(len(samples) * 0.99)] * 1e3,
+                statistics.mean(samples) * 1e3
+            )
+        )
@@ -0,0 +1,97 @@
+import os
+from multiprocessing import get_context
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import sharding, thumbnails
+from posts.models import Post
+
+
+def rebuild(job):
+    post_id, name, force = job
+    if force:
+        default.kvstore.delete_thumbnails(ImageFile(name))
+    return thumbnails.build(post_id, name)
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры картинок всех постов параллельно на всех ядрах. '
+        'Прогресс сохраняется после каждой пачки, повторный запуск '
+        'продолжает с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов (по умолчанию — по числу ядер).'
+        )
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, '.thumbnails_progress'),
+            help='Файл с id последних обработанных постов по шардам.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Перестроить миниатюры, даже если они уже есть.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не глядя на сохранённый прогресс.'
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        progress = {} if options['restart'] else self.read(checkpoint)
+        built = 0
+        # Соединения не должны достаться дочерним процессам.
+        connections.close_all()
+        with get_context().Pool(
+            options['workers'], initializer=django.setup
+        ) as pool:
+            # Посты лежат на шардах (posts.sharding): каждый обходится
+            # по id со своей отметкой прогресса.
+            for alias in sharding.shards():
+                posts = Post.objects.using(alias).exclude(
+                    image=''
+                ).order_by('pk').values_list('pk', 'image')
+                while True:
+                    batch = list(posts.filter(
+                        pk__gt=progress.get(alias, 0)
+                    )[:options['batch_size']])
+                    connections.close_all()
+                    if not batch:
+                        break
+                    jobs = [
+                        (pk, name, options['force']) for pk, name in batch
+                    ]
+                    built += sum(pool.map(rebuild, jobs))
+                    progress[alias] = batch[-1][0]
+                    self.write(checkpoint, progress)
+                    self.stdout.write(
+                        f'{alias}, пост {progress[alias]}: построено {built}'
+                    )
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(f'Готово, построено {built}'))
+
+    def read(self, checkpoint):
+        """Последние обработанные id по шардам: строки «алиас id»."""
+        try:
+            with open(checkpoint) as file:
+                lines = [line.split() for line in file]
+            return {alias: int(last_id) for alias, last_id in lines}
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, checkpoint, progress):
+        with open(f'{checkpoint}.tmp', 'w') as file:
+            for alias, last_id in progress.items():
+                file.write(f'{alias} {last_id}\n')
+        os.replace(f'{checkpoint}.tmp', checkpoint)
@@ -0,0 +1,413 @@
+"""Нагрузочный прогон публичных страниц постов.
+
+Команда засевает базу пользователями, группами, постами, подписками
+и комментариями (mixer и Faker), поднимает в этом же процессе
+многопоточный WSGI-сервер Django и гоняет по нему параллельные
+сессии: анонимные читают ленты и посты, вошедшие ещё читают ленту
+подписок, пишут комментарии и посты. По каждой странице печатаются
+перцентили и гистограмма задержек, а результат можно сохранить
+в JSON и сравнивать с ним следующие прогоны.
+
+Прогон пишет в текущую базу, поэтому запускать его стоит на копии.
+"""
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer,
+    WSGIRequestHandler
+)
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import Mixer
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PREFIX = 'loadtest'
+# Границы корзин гистограммы, мс.
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, math.inf)
+BAR_WIDTH = 40
+# Сколько последних постов берётся для страниц постов и комментариев.
+POST_SAMPLE = 1000
+
+
+class Endpoint:
+    def __init__(self, name, weight, build, login_required=False):
+        self.name = name
+        self.weight = weight
+        self.build = build
+        self.login_required = login_required
+
+
+def _index(rng, data):
+    return 'GET', reverse('posts:index'), None
+
+
+def _group(rng, data):
+    return 'GET', reverse(
+        'posts:group_list', args=[rng.choice(data['slugs'])]
+    ), None
+
+
+def _profile(rng, data):
+    return 'GET', reverse(
+        'posts:profile', args=[rng.choice(data['usernames'])]
+    ), None
+
+
+def _post_detail(rng, data):
+    return 'GET', reverse(
+        'posts:post_detail', args=[rng.choice(data['post_ids'])]
+    ), None
+
+
+def _follow_index(rng, data):
+    return 'GET', reverse('posts:follow_index'), None
+
+
+def _add_comment(rng, data):
+    return 'POST', reverse(
+        'posts:add_comment', args=[rng.choice(data['post_ids'])]
+    ), {'text': data['faker'].sentence()}
+
+
+def _post_create(rng, data):
+    return 'POST', reverse('posts:post_create'), {
+        'text': data['faker'].text(),
+        'group': rng.choice(data['group_ids']),
+    }
+
+
+ENDPOINTS = (
+    Endpoint('index', 30, _index),
+    Endpoint('group_list', 15, _group),
+    Endpoint('profile', 15, _profile),
+    Endpoint('post_detail', 25, _post_detail),
+    Endpoint('follow_index', 15, _follow_index, login_required=True),
+    Endpoint('add_comment', 5, _add_comment, login_required=True),
+    Endpoint('post_create', 2, _post_create, login_required=True),
+)
+
+
+def percentile(ordered, fraction):
+    """Перцентиль по ближайшему рангу из отсортированного списка."""
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(fraction * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def histogram(latencies):
+    counts = [0] * len(BUCKETS)
+    for latency in latencies:
+        for number, bound in enumerate(BUCKETS):
+            if latency <= bound:
+                counts[number] += 1
+                break
+    return counts
+
+
+def summarize(samples, duration):
+    """Сводка по задержкам страницы: samples — [(мс, успех)]."""
+    latencies = sorted(latency for latency, _ in samples)
+    return {
+        'count': len(samples),
+        'errors': sum(1 for _, ok in samples if not ok),
+        'rps': round(len(samples) / duration, 2) if duration else 0.0,
+        'mean_ms': round(sum(latencies) / len(latencies), 2)
+        if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.5), 2),
+        'p90_ms': round(percentile(latencies, 0.9), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+        'histogram': histogram(latencies),
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Строки сравнения и список страниц, где p99 вырос сверх допуска."""
+    lines = []
+    regressions = []
+    for name, stats in current.items():
+        old = baseline.get(name)
+        if old is None:
+            lines.append(f'{name:<13} нет в базе сравнения')
+            continue
+        changes = []
+        for key in ('p50_ms', 'p99_ms', 'rps'):
+            before = old[key]
+            change = (stats[key] - before) / before * 100 if before else 0.0
+            changes.append(f'{key} {before:.1f} → {stats[key]:.1f} '
+                           f'({change:+.0f}%)')
+        regressed = stats['p99_ms'] > old['p99_ms'] * (1 + tolerance)
+        if regressed:
+            regressions.append(name)
+        lines.append('{:<13} {}{}'.format(
+            name, '  '.join(changes), '  РЕГРЕССИЯ' if regressed else ''
+        ))
+    return lines, regressions
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон лент, постов, комментариев и публикации: '
+        'p50/p99, запросы в секунду и гистограмма задержек по страницам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок у каждого пользователя.')
+        parser.add_argument(
+            '--no-seed', action='store_true',
+            help='Не засевать базу, взять уже созданных пользователей.'
+        )
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Длительность замера, секунд.')
+        parser.add_argument('--warmup', type=float, default=2,
+                            help='Сколько секунд не учитывать в начале.')
+        parser.add_argument('--logged-in', type=float, default=0.5,
+                            help='Доля сессий вошедших пользователей.')
+        parser.add_argument(
+            '--url',
+            help='Адрес уже запущенного сервера (gunicorn и т. п.) '
+                 'с той же базой; по умолчанию сервер поднимается здесь.'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--save', help='Записать результат в JSON.')
+        parser.add_argument('--compare',
+                            help='Сравнить с ранее сохранённым JSON.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимый рост p99 при сравнении.')
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        faker = Faker('ru_RU')
+        faker.seed_instance(options['seed'])
+        users = list(
+            User.objects.filter(username__startswith=f'{PREFIX}-')
+        )
+        if not options['no_seed'] and not users:
+            users = self.seed(generator, faker, options)
+        if not users:
+            raise CommandError(
+                'Нет пользователей для прогона: запустите без --no-seed.'
+            )
+        data = {
+            'usernames': [user.username for user in users],
+            'slugs': list(Group.objects.values_list('slug', flat=True)),
+            'group_ids': list(Group.objects.values_list('id', flat=True)),
+            'post_ids': list(Post.objects.order_by('-id').values_list(
+                'id', flat=True
+            )[:POST_SAMPLE]),
+            'faker': faker,
+        }
+        if not data['slugs'] or not data['post_ids']:
+            raise CommandError('В базе нет групп или постов.')
+        server = None
+        base_url = options['url']
+        if base_url is None:
+            server = self.start_server()
+            base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+        try:
+            samples, duration = self.run(
+                base_url.rstrip('/'), users, data, generator, options
+            )
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+        results = {
+            endpoint.name: summarize(samples[endpoint.name], duration)
+            for endpoint in ENDPOINTS if samples[endpoint.name]
+        }
+        self.report(results, duration)
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'created': datetime.now().isoformat(timespec='seconds'),
+                    'concurrency': options['concurrency'],
+                    'duration': options['duration'],
+                    'logged_in': options['logged_in'],
+                    'endpoints': results,
+                }, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)['endpoints']
+            lines, regressions = compare(
+                results, baseline, options['tolerance']
+            )
+            self.stdout.write('\n'.join(lines))
+            if regressions:
+                raise CommandError(
+                    'p99 вырос сверх допуска: ' + ', '.join(regressions)
+                )
+
+    def seed(self, generator, faker, options):
+        mixer = Mixer(locale='ru_RU')
+        users = mixer.cycle(options['users']).blend(
+            User,
+            username=(f'{PREFIX}-{number}'
+                      for number in range(options['users']))
+        )
+        groups = mixer.cycle(options['groups']).blend(
+            Group,
+            slug=(f'{PREFIX}-{number}' for number in range(options['groups'])),
+            title=(faker.word() for _ in range(options['groups'])),
+            description=(faker.sentence() for _ in range(options['groups']))
+        )
+        # У популярных авторов больше постов и больше подписчиков.
+        weights = [1 / (rank + 1) for rank in range(len(users))]
+        posts = mixer.cycle(options['posts']).blend(
+            Post,
+            author=(generator.choices(users, weights)[0]
+                    for _ in range(options['posts'])),
+            group=(generator.choice(groups + [None])
+                   for _ in range(options['posts'])),
+            text=(faker.text() for _ in range(options['posts'])),
+            image=''
+        )
+        mixer.cycle(options['comments']).blend(
+            Comment,
+            post=(generator.choice(posts) for _ in range(options['comments'])),
+            author=(generator.choice(users)
+                    for _ in range(options['comments'])),
+            text=(faker.sentence() for _ in range(options['comments']))
+        )
+        follows = min(options['follows'], len(users) - 1)
+        for user in users:
+            authors = set()
+            while len(authors) < follows:
+                author = generator.choices(users, weights)[0]
+                if author != user:
+                    authors.add(author)
+            for author in authors:
+                Follow.objects.create(user=user, author=author)
+        self.stdout.write(
+            f'Засеяно: {len(users)} пользователей, {len(groups)} групп, '
+            f'{len(posts)} постов, {options["comments"]} комментариев, '
+            f'{follows * len(users)} подписок'
+        )
+        return users
+
+    def start_server(self):
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+        server.daemon_threads = True
+        server.set_app(WSGIHandler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def open_session(self, base_url, user):
+        session = requests.Session()
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            session.cookies.set(
+                settings.SESSION_COOKIE_NAME,
+                client.cookies[settings.SESSION_COOKIE_NAME].value
+            )
+            # Страница формы выдаёт cookie csrftoken для POST-запросов.
+            session.get(base_url + reverse('posts:post_create'))
+            session.headers['X-CSRFToken'] = session.cookies.get(
+                settings.CSRF_COOKIE_NAME, ''
+            )
+        return session
+
+    def run(self, base_url, users, data, generator, options):
+        samples = {endpoint.name: [] for endpoint in ENDPOINTS}
+        lock = threading.Lock()
+        started = time.perf_counter()
+        measured_from = started + options['warmup']
+        deadline = measured_from + options['duration']
+
+        def worker(number):
+            rng = random.Random(options['seed'] * 1000 + number)
+            logged_in = rng.random() < options['logged_in']
+            user = users[number % len(users)] if logged_in else None
+            session = self.open_session(base_url, user)
+            endpoints = [
+                endpoint for endpoint in ENDPOINTS
+                if logged_in or not endpoint.login_required
+            ]
+            weights = [endpoint.weight for endpoint in endpoints]
+            # Вход шёл через базу в этом потоке, дальше она не нужна.
+            connection.close()
+            while True:
+                endpoint = rng.choices(endpoints, weights)[0]
+                method, path, form = endpoint.build(rng, data)
+                begin = time.perf_counter()
+                if begin >= deadline:
+                    break
+                try:
+                    response = session.request(
+                        method, base_url + path,
+                        data=form, allow_redirects=False
+                    )
+                    ok = response.status_code < 400
+                except requests.RequestException:
+                    ok = False
+                elapsed = (time.perf_counter() - begin) * 1e3
+                if begin >= measured_from:
+                    with lock:
+                        samples[endpoint.name].append((elapsed, ok))
+
+        threads = [
+            threading.Thread(target=worker, args=(number,))
+            for number in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, options['duration']
+
+    def report(self, results, duration):
+        total = sum(stats['count'] for stats in results.values())
+        self.stdout.write(
+            f'Всего {total} запросов за {duration:.0f} с, '
+            f'{total / duration:.1f} запросов/с'
+        )
+        for name, stats in results.items():
+            self.stdout.write(
+                '\n{:<13} {:6d} запросов  {:7.1f}/с  ошибок {}  '
+                'p50 {:.1f}  p90 {:.1f}  p99 {:.1f}  max {:.1f} мс'.format(
+                    name, stats['count'], stats['rps'], stats['errors'],
+                    stats['p50_ms'], stats['p90_ms'], stats['p99_ms'],
+                    stats['max_ms']
+                )
+            )
+            peak = max(stats['histogram']) or 1
+            lower = 0
+            for bound, count in zip(BUCKETS, stats['histogram']):
+                if count:
+                    label = f'{lower}–{bound}' if bound != math.inf else (
+                        f'> {lower}'
+                    )
+                    self.stdout.write('  {:>12} мс {:6d} {}'.format(
+                        label, count, '#' * max(
+                            round(count / peak * BAR_WIDTH), 1
+                        )
+                    ))
+                lower = bound
@@ -0,0 +1,148 @@
+from collections import Counter
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max
+
+from posts import sharding, timeline
+from posts.models import Comment, Post, TimelineEntry, User
+from posts.utils import explicit_dates
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует пользователей и группы на шарды и переносит посты '
+        'с комментариями на шарды их авторов (POST_SHARDS). Пост сначала '
+        'копируется, потом удаляется из старого места, поэтому прерванный '
+        'перенос можно просто запустить заново.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько строк переносить в одной транзакции.'
+        )
+        parser.add_argument(
+            '--source', action='append', default=[],
+            help='Ещё алиас, с которого забрать посты, например шард, '
+                 'выведенный из POST_SHARDS. Можно повторять.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, сколько постов куда переедет.'
+        )
+
+    def handle(self, *args, batch_size, source, dry_run, **options):
+        if sharding.is_sharded() and not dry_run:
+            for label in sharding.MIRRORED_MODELS:
+                model = apps.get_model(label)
+                copied = self.mirror(model, batch_size)
+                self.stdout.write(
+                    f'{model._meta.verbose_name_plural}: '
+                    f'скопировано на шарды {copied}'
+                )
+        sources = dict.fromkeys(
+            [*sharding.shards(), DEFAULT_DB_ALIAS, *source]
+        )
+        moves = Counter()
+        for alias in sources:
+            authors = Post.objects.using(alias).order_by(
+                'author_id'
+            ).values_list('author_id', flat=True).distinct()
+            for author_id in list(authors):
+                target = sharding.shard_for(author_id)
+                if target == alias:
+                    continue
+                if dry_run:
+                    moves[alias, target] += Post.objects.using(alias).filter(
+                        author_id=author_id
+                    ).count()
+                else:
+                    moves[alias, target] += self.move(
+                        author_id, alias, target, batch_size
+                    )
+        for (alias, target), count in sorted(moves.items()):
+            self.stdout.write(f'{alias} -> {target}: {count} постов')
+        if moves and not dry_run and not sharding.is_sharded():
+            # Посты вернулись в одну базу: ленты подписок снова нужны.
+            last = User.objects.aggregate(last=Max('id'))['last'] or 0
+            entries = timeline.rebuild(1, last)
+            self.stdout.write(f'Ленты подписок: {entries} записей')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: перенесено {sum(moves.values())} постов'
+        ))
+
+    def mirror(self, model, batch_size):
+        """Копирует строки model из основной базы на остальные шарды."""
+        targets = [
+            alias for alias in sharding.shards() if alias != DEFAULT_DB_ALIAS
+        ]
+        if not targets:
+            return 0
+        fields = [
+            field.name for field in model._meta.concrete_fields
+            if not field.primary_key
+        ]
+        rows = model._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk')
+        copied = 0
+        batch = list(rows[:batch_size])
+        while batch:
+            ids = [row.pk for row in batch]
+            for alias in targets:
+                manager = model._base_manager.using(alias)
+                present = set(
+                    manager.filter(pk__in=ids).values_list('pk', flat=True)
+                )
+                with transaction.atomic(using=alias):
+                    manager.bulk_create(
+                        [row for row in batch if row.pk not in present]
+                    )
+                    manager.bulk_update(
+                        [row for row in batch if row.pk in present], fields
+                    )
+            copied += len(batch)
+            batch = list(rows.filter(pk__gt=ids[-1])[:batch_size])
+        return copied
+
+    def move(self, author_id, source, target, batch_size):
+        """Переносит посты автора с комментариями с source на target.
+
+        Строки переносятся как есть, мимо сигналов: счётчики при
+        переезде не меняются. Записи ленты подписок на перенесённые
+        посты в source удаляются.
+        """
+        posts = Post.objects.using(source).filter(
+            author_id=author_id
+        ).order_by('pk')
+        dates = (
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        )
+        moved = 0
+        batch = list(posts[:batch_size])
+        while batch:
+            ids = [post.pk for post in batch]
+            comments = list(
+                Comment.objects.using(source).filter(post_id__in=ids)
+            )
+            with explicit_dates(*dates), transaction.atomic(using=target):
+                Post.objects.using(target).bulk_create(
+                    batch, ignore_conflicts=True
+                )
+                Comment.objects.using(target).bulk_create(
+                    comments, batch_size=batch_size, ignore_conflicts=True
+                )
+            with transaction.atomic(using=source):
+                for model, field in (
+                    (TimelineEntry, 'post_id'),
+                    (Comment, 'post_id'),
+                    (Post, 'pk'),
+                ):
+                    model.objects.using(source).filter(
+                        **{f'{field}__in': ids}
+                    )._raw_delete(source)
+            sharding.forget_locations(ids)
+            moved += len(batch)
+            batch = list(posts[:batch_size])
+        return moved
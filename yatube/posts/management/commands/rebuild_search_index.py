@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search, sharding
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает полнотекстовые индексы постов и комментариев '
+        'по содержимому таблиц.'
+    )
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError(
+                'Полнотекстовый поиск работает только в SQLite.'
+            )
+        for alias in sharding.shards():
+            search.rebuild(alias)
+            for model in search.INDEXES:
+                self.stdout.write(
+                    f'{alias}: {model._meta.verbose_name_plural}: '
+                    f'в индексе {model.objects.using(alias).count()}'
+                )
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import counters, sharding
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики пачками по диапазонам id, '
+        'каждая пачка — в своей короткой транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько id обрабатывать в одной транзакции.'
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.0,
+            help='Пауза между пачками в секундах, чтобы не мешать записи.'
+        )
+
+    def handle(self, *args, **options):
+        targets = (
+            ('пользователи', User, counters.reconcile_users),
+            ('группы', Group, counters.reconcile_groups),
+        )
+        for title, model, reconcile in targets:
+            fixed = self.run_batches(model, reconcile, **options)
+            self.stdout.write(f'{title}: исправлено {fixed}')
+        fixed = 0
+        # Комментарии лежат на шарде своего поста: каждый шард
+        # пересчитывается отдельно.
+        for alias in sharding.aliases():
+            with sharding.pinned(alias):
+                fixed += self.run_batches(
+                    Post, counters.reconcile_posts, **options
+                )
+        self.stdout.write(f'посты: исправлено {fixed}')
+
+    def run_batches(self, model, reconcile, batch_size, pause, **options):
+        # Диапазоны строятся по существующим id: id постов разрежены
+        # (core.snowflake), и шаг по всем числам подряд не кончился бы.
+        ids = model.objects.order_by('pk').values_list('pk', flat=True)
+        fixed = 0
+        batch = list(ids[:batch_size])
+        while batch:
+            fixed += reconcile(batch[0], batch[-1])
+            if len(batch) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+            batch = list(ids.filter(pk__gt=batch[-1])[:batch_size])
+        return fixed
@@ -0,0 +1,403 @@
+"""Массовое наполнение базы синтетическими данными.
+
+Строки генерируют дочерние процессы (Faker — самая медленная часть),
+а пишет их один родительский процесс пачками bulk_create: у SQLite
+всё равно один писатель. Каждая пачка засевается из --seed, вида
+данных и своего номера, поэтому результат не зависит от числа
+процессов. Id назначаются заранее: пользователям — продолжая уже
+существующие, постам и комментариям — Snowflake-id из их дат,
+так что пачки ссылаются друг на друга без запросов к базе.
+
+На время загрузки вторичные индексы лент снимаются и строятся
+после неё одним проходом; счётчики и ленты подписок, которые обычно
+ведут сигналы, пересчитываются в конце. Если посты шардированы,
+всё пишется в основную базу и раскладывается по шардам командой
+rebalance_shards.
+"""
+import io
+import itertools
+import os
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+from multiprocessing import get_context
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from core import snowflake
+from posts import sharding, timeline
+from posts.cache import bump_generations
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+from posts.utils import explicit_dates
+
+User = get_user_model()
+
+# Индексы этих моделей снимаются на время загрузки.
+DEFERRED_INDEXES = (Post, Comment, Follow, TimelineEntry)
+SAMPLE_IMAGE_SIZE = (960, 640)
+SAMPLE_IMAGE_DIR = 'posts/seed'
+
+_state = {}
+
+
+def _init(plan, setup=True):
+    if setup:
+        django.setup()
+    _state['plan'] = plan
+    _state['faker'] = Faker('ru_RU')
+    # Закон Ципфа: автор с рангом r популярнее в 1 / r ** zipf раз.
+    _state['popularity'] = list(itertools.accumulate(
+        1 / (rank + 1) ** plan['zipf'] for rank in range(plan['users'])
+    ))
+
+
+def _generate(task):
+    kind, chunk, first, count = task
+    plan = _state['plan']
+    rng = random.Random(f'{plan["seed"]}:{kind}:{chunk}')
+    faker = _state['faker']
+    faker.seed_instance(f'{plan["seed"]}:{kind}:{chunk}')
+    return kind, [
+        ROWS[kind](plan, rng, faker, number)
+        for number in range(first, first + count)
+    ]
+
+
+def _popular_user(plan, rng):
+    return plan['user_base'] + rng.choices(
+        range(plan['users']), cum_weights=_state['popularity']
+    )[0]
+
+
+def _pub_date(plan, number):
+    return plan['start'] + plan['span'] * number / max(plan['posts'], 1)
+
+
+def _sequence(number):
+    # Даты постов и комментариев растут с номером, поэтому в одну
+    # миллисекунду попадают соседние номера, и их остатки различны.
+    return number % (snowflake.MAX_SEQUENCE + 1)
+
+
+def _post_id(plan, number):
+    return snowflake.from_datetime(
+        _pub_date(plan, number), sequence=_sequence(number)
+    )
+
+
+def _user_row(plan, rng, faker, number):
+    return (
+        plan['user_base'] + number,
+        f'{faker.user_name()}{plan["user_base"] + number}',
+        faker.first_name(),
+        faker.last_name(),
+        faker.email(),
+        plan['start'] + plan['span'] * rng.random(),
+    )
+
+
+def _post_row(plan, rng, faker, number):
+    image = ''
+    if plan['images'] and rng.random() < plan['image_ratio']:
+        image = '{}/sample_{}.jpg'.format(
+            SAMPLE_IMAGE_DIR, rng.randrange(plan['images'])
+        )
+    group = None
+    if plan['group_ids'] and rng.random() < plan['group_ratio']:
+        group = rng.choice(plan['group_ids'])
+    return (
+        _post_id(plan, number),
+        _popular_user(plan, rng),
+        group,
+        faker.text(max_nb_chars=rng.choice((80, 200, 600))),
+        _pub_date(plan, number),
+        image,
+    )
+
+
+def _comment_row(plan, rng, faker, number):
+    created = plan['start'] + plan['span'] * number / plan['comments']
+    # Комментарий достаётся одному из постов, опубликованных до него.
+    published = plan['posts'] * number // plan['comments'] + 1
+    post = rng.randrange(min(published, plan['posts']))
+    created = max(created, _pub_date(plan, post))
+    return (
+        snowflake.from_datetime(created, sequence=_sequence(number)),
+        _post_id(plan, post),
+        plan['user_base'] + rng.randrange(plan['users']),
+        faker.sentence(),
+        created,
+    )
+
+
+def _follow_rows(plan, rng, faker, number):
+    user_id = plan['user_base'] + number
+    wanted = min(
+        round(rng.expovariate(1 / plan['follows'])) if plan['follows'] else 0,
+        plan['users'] - 1
+    )
+    authors = set()
+    while len(authors) < wanted:
+        author_id = _popular_user(plan, rng)
+        if author_id != user_id:
+            authors.add(author_id)
+    return [(user_id, author_id) for author_id in sorted(authors)]
+
+
+ROWS = {
+    'users': _user_row,
+    'posts': _post_row,
+    'comments': _comment_row,
+    'follows': _follow_rows,
+}
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+@contextmanager
+def deferred_indexes(models):
+    if not models:
+        yield
+        return
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+
+
+@contextmanager
+def fast_writes():
+    """Без fsync на каждую транзакцию: при сбое загрузку всё равно
+    начинать заново."""
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        previous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA synchronous = {int(previous)}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками со степенным распределением.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок у пользователя.'
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.0,
+            help='Показатель степени в популярности авторов.'
+        )
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты.')
+        parser.add_argument(
+            '--group-ratio', type=float, default=0.7,
+            help='Доля постов в группах.'
+        )
+        parser.add_argument('--images', type=int, default=8,
+                            help='Сколько образцов картинок создать.')
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.05,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессов-генераторов; 0 — генерировать здесь же.'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--keep-indexes', action='store_true',
+            help='Не снимать индексы на время загрузки.'
+        )
+        parser.add_argument(
+            '--password', default='seed-password',
+            help='Общий пароль всех созданных пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        if options['posts'] and not options['users']:
+            raise CommandError('Постам нужны авторы: задайте --users.')
+        end = timezone.now()
+        span = timedelta(days=options['days'])
+        rows = max(options['posts'], options['comments'])
+        if rows / (span / timedelta(milliseconds=1)) >= snowflake.MAX_SEQUENCE:
+            raise CommandError(
+                'В миллисекунду не помещаются id всех строк: '
+                'увеличьте --days.'
+            )
+        group_ids = self.create_groups(options)
+        plan = {
+            'seed': options['seed'],
+            'users': options['users'],
+            'posts': options['posts'],
+            'comments': options['comments'],
+            'follows': options['follows'],
+            'zipf': options['zipf'],
+            'images': options['images'],
+            'image_ratio': options['image_ratio'],
+            'group_ratio': options['group_ratio'],
+            'group_ids': group_ids,
+            'user_base': _next_id(User),
+            'start': end - span,
+            'span': span,
+            'end': end,
+        }
+        if options['images']:
+            self.create_images(options['images'], options['seed'])
+        self.password = make_password(options['password'])
+        tasks = list(self.tasks(options))
+        indexes = () if options['keep_indexes'] else DEFERRED_INDEXES
+        dates = (
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        )
+        with self.generator(plan, options['workers']) as generate:
+            with fast_writes(), deferred_indexes(indexes), \
+                    explicit_dates(*dates):
+                for kind, rows in generate(tasks):
+                    self.write(kind, rows)
+                self.stdout.write('Строю индексы…')
+        if sharding.is_sharded():
+            self.stdout.write('Раскладываю посты по шардам…')
+            call_command('rebalance_shards', stdout=io.StringIO())
+        self.stdout.write('Пересчитываю счётчики…')
+        call_command('reconcile_counters', stdout=io.StringIO())
+        if options['users']:
+            entries = timeline.rebuild(
+                plan['user_base'], plan['user_base'] + options['users'] - 1
+            )
+            self.stdout.write(f'Ленты подписок: {entries} записей')
+        bump_generations(['all'])
+        self.stdout.write(self.style.SUCCESS(
+            'Готово: {users} пользователей, {groups} групп, {posts} постов, '
+            '{comments} комментариев'.format(**options)
+        ))
+        if options['images'] and options['image_ratio']:
+            self.stdout.write(
+                'Миниатюры картинок: manage.py generate_thumbnails'
+            )
+
+    def tasks(self, options):
+        # Пользователи раньше постов, посты раньше комментариев:
+        # внешние ключи ссылаются только на уже записанные строки.
+        size = options['batch_size']
+        for kind in ('users', 'posts', 'comments', 'follows'):
+            total = options['users'] if kind == 'follows' else options[kind]
+            for chunk, first in enumerate(range(0, total, size)):
+                yield kind, chunk, first, min(size, total - first)
+
+    @contextmanager
+    def generator(self, plan, workers):
+        if workers < 1:
+            _init(plan, setup=False)
+            yield partial(map, _generate)
+            return
+        # Соединения не должны достаться дочерним процессам, поэтому
+        # пул создаётся до настройки соединения под загрузку.
+        connections.close_all()
+        with get_context().Pool(
+            workers, initializer=_init, initargs=(plan,)
+        ) as pool:
+            yield partial(pool.imap, _generate)
+
+    def write(self, kind, rows):
+        with transaction.atomic():
+            if kind == 'users':
+                User.objects.bulk_create(
+                    User(
+                        id=user_id, username=username,
+                        first_name=first_name, last_name=last_name,
+                        email=email, date_joined=joined,
+                        password=self.password
+                    )
+                    for user_id, username, first_name, last_name, email,
+                    joined in rows
+                )
+            elif kind == 'posts':
+                Post.objects.bulk_create(
+                    Post(
+                        id=post_id, author_id=author_id, group_id=group_id,
+                        text=text, pub_date=pub_date, image=image
+                    )
+                    for post_id, author_id, group_id, text, pub_date,
+                    image in rows
+                )
+            elif kind == 'comments':
+                Comment.objects.bulk_create(
+                    Comment(
+                        id=comment_id, post_id=post_id, author_id=author_id,
+                        text=text, created=created
+                    )
+                    for comment_id, post_id, author_id, text, created in rows
+                )
+            else:
+                Follow.objects.bulk_create(
+                    Follow(user_id=user_id, author_id=author_id)
+                    for edges in rows for user_id, author_id in edges
+                )
+        self.stdout.write(f'{kind}: +{len(rows)}')
+
+    def create_groups(self, options):
+        first = _next_id(Group)
+        faker = Faker('ru_RU')
+        faker.seed_instance(f'{options["seed"]}:groups')
+        Group.objects.bulk_create(
+            Group(
+                id=group_id,
+                slug=f'group-{group_id}',
+                title=faker.catch_phrase()[:200],
+                description=faker.paragraph()
+            )
+            for group_id in range(first, first + options['groups'])
+        )
+        return list(range(first, first + options['groups']))
+
+    def create_images(self, count, seed):
+        rng = random.Random(f'{seed}:images')
+        for number in range(count):
+            name = f'{SAMPLE_IMAGE_DIR}/sample_{number}.jpg'
+            if default_storage.exists(name):
+                continue
+            image = Image.new(
+                'RGB', SAMPLE_IMAGE_SIZE,
+                tuple(rng.randrange(256) for _ in range(3))
+            )
+            buffer = io.BytesIO()
+            image.save(buffer, 'JPEG', quality=85)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
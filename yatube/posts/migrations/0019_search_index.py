@@ -0,0 +1,75 @@
+from django.db import migrations
+
+# Внешние (external content) индексы FTS5: текст хранится только
+# в самих таблицах постов и комментариев, триггеры держат индекс
+# в актуальном состоянии при вставке, правке и удалении строк.
+TABLES = ('posts_post', 'posts_comment')
+
+CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+    text,
+    content='{table}',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table}
+BEGIN
+    INSERT INTO {table}_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table}
+BEGIN
+    INSERT INTO {table}_fts ({table}_fts, rowid, text)
+    VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_fts_update
+AFTER UPDATE OF text ON {table}
+BEGIN
+    INSERT INTO {table}_fts ({table}_fts, rowid, text)
+    VALUES ('delete', old.id, old.text);
+    INSERT INTO {table}_fts (rowid, text) VALUES (new.id, new.text);
+END;
+INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild');
+"""
+
+DROP = """
+DROP TRIGGER IF EXISTS {table}_fts_insert;
+DROP TRIGGER IF EXISTS {table}_fts_delete;
+DROP TRIGGER IF EXISTS {table}_fts_update;
+DROP TABLE IF EXISTS {table}_fts;
+"""
+
+
+def run_script(script):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        with schema_editor.connection.cursor() as cursor:
+            for table in TABLES:
+                for statement in split(script.format(table=table)):
+                    cursor.execute(statement)
+    return run
+
+
+def split(script):
+    """Делит скрипт на запросы, не разрывая тела триггеров."""
+    statements, current = [], []
+    for line in script.strip().splitlines():
+        current.append(line)
+        text = '\n'.join(current).strip()
+        if text.endswith(';') and (
+            'BEGIN' not in text or text.endswith('END;')
+        ):
+            statements.append(text)
+            current = []
+    return statements
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_post_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_script(CREATE), run_script(DROP)),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 2.2.16 on 2026-10-17 06:45
+
+from importlib import import_module
+
+import core.snowflake
+from django.db import migrations, models
+
+# Смена первичного ключа пересоздаёт таблицы постов и комментариев,
+# а с ними пропадают триггеры индекса FTS5: их нужно поставить снова
+# после пересоздания в любую сторону. Старые строки сохраняют свои id.
+search_index = import_module('posts.migrations.0019_search_index')
+restore_search_triggers = search_index.run_script(search_index.CREATE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_comment_created_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='comment',
+            options={'ordering': ('-id',), 'verbose_name': 'Комментарий', 'verbose_name_plural': 'Комментарии'},
+        ),
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ('-id',), 'verbose_name': 'Пост', 'verbose_name_plural': 'Посты'},
+        ),
+        migrations.AlterModelOptions(
+            name='timelineentry',
+            options={'ordering': ('-post_id',), 'verbose_name': 'Запись ленты', 'verbose_name_plural': 'Лента подписок'},
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_feed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_author_feed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='post_group_feed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='timeline_user_feed_idx',
+        ),
+        migrations.RunPython(
+            migrations.RunPython.noop, restore_search_triggers
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='id',
+            field=core.snowflake.SnowflakeField(default=None, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='id',
+            field=core.snowflake.SnowflakeField(default=None, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(
+            restore_search_triggers, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-id'], name='comment_post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-id'], name='post_author_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-id'], name='post_group_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-post'], name='timeline_user_feed_idx'),
+        ),
+    ]
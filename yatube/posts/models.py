@@ -1,10 +1,44 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from core.snowflake import SnowflakeField
+
 User = get_user_model()
 
 
-class Group(models.Model):
+class CounterFieldsMixin:
+    """Счётчики меняются только F-выражениями.
+
+    При обновлении объекта поля из counter_fields не записываются,
+    чтобы не затереть приращения, сделанные параллельно.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class RoutedCreateQuerySet(models.QuerySet):
+    """create() выбирает базу по самому новому объекту.
+
+    Обычный create() сохраняет объект в базу выборки, которую роутер
+    определяет без объекта; шарду поста (posts.sharding) нужен автор.
+    """
+
+    def create(self, **kwargs):
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=self._db)
+        return obj
+
+
+class Group(CounterFieldsMixin, models.Model):
     title = models.CharField(
         'Название группы',
         max_length=200,
@@ -19,6 +53,13 @@ class Group(models.Model):
         'Описание группы',
         help_text='Enter the group description, please.'
     )
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('posts_count',)
 
     class Meta:
         verbose_name_plural = 'Группы'
@@ -27,7 +68,10 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class Post(CounterFieldsMixin, models.Model):
+    objects = RoutedCreateQuerySet.as_manager()
+
+    id = SnowflakeField()
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -57,17 +101,46 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    version = models.PositiveIntegerField(
+        'Версия правки',
+        default=1,
+        editable=False
+    )
+
+    counter_fields = ('comments_count',)
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-id',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='post_feed_idx'
+            ),
+            models.Index(
+                fields=('author', '-id'),
+                name='post_author_feed_idx'
+            ),
+            models.Index(
+                fields=('group', '-id'),
+                name='post_group_feed_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
 class Comment(models.Model):
+    objects = RoutedCreateQuerySet.as_manager()
+
+    id = SnowflakeField()
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -91,9 +164,19 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ('-created',)
+        ordering = ('-id',)
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=('post', '-id'),
+                name='comment_post_feed_idx'
+            ),
+            models.Index(
+                fields=('-created', '-id'),
+                name='comment_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:50]
@@ -122,3 +205,77 @@ class Follow(models.Model):
                 name='Подписчик - не автор'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx'
+            ),
+        ]
+
+
+class UserCounter(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """Строка материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-post_id',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='Пост в ленте один раз'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-post'),
+                name='timeline_user_feed_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'
+            ),
+        ]
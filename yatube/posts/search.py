@@ -0,0 +1,157 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Индексы — таблицы SQLite FTS5 поверх posts_post и posts_comment
+(см. миграцию 0019): триггеры обновляют их вместе с самими
+таблицами, поэтому поиск не просматривает тексты через LIKE.
+"""
+import re
+
+from django.core.paginator import Paginator
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    connection,
+    connections,
+    router
+)
+
+from . import sharding
+from .models import Comment, Post
+from .utils import CursorPaginator, MergedCursorPaginator
+
+INDEXES = {
+    Post: 'posts_post_fts',
+    Comment: 'posts_comment_fts',
+}
+TOKENIZE = 'unicode61 remove_diacritics 2'
+# Слишком длинный запрос дорог и почти никогда не нужен.
+MAX_WORDS = 10
+WORD = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Строка поиска пользователя в выражение FTS5.
+
+    Каждое слово берётся в кавычки и ищется по префиксу, все слова
+    должны встретиться в тексте. Операторы и спецсимволы FTS5
+    из строки поиска так не интерпретируются.
+    """
+    words = WORD.findall(query)[:MAX_WORDS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def filter_matching(queryset, query):
+    """Оставляет в выборке только строки, найденные индексом."""
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    # pk__in=RawSQL(...) даёт IN ((SELECT ...)), а SQLite считает
+    # такой подзапрос скалярным и берёт из него только первую строку.
+    table = INDEXES[queryset.model]
+    return queryset.extra(
+        where=[
+            f'"{queryset.model._meta.db_table}"."id" IN '
+            f'(SELECT rowid FROM {table} WHERE {table} MATCH %s)'
+        ],
+        params=[expression]
+    )
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    """Пересобирает индексы по содержимому таблиц и сжимает их."""
+    with connections[using].cursor() as cursor:
+        for table in INDEXES.values():
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+            cursor.execute(
+                f"INSERT INTO {table} ({table}) VALUES ('optimize')"
+            )
+
+
+class SearchPaginator(CursorPaginator):
+    """Посты по релевантности с курсором по (rank, id).
+
+    rank — оценка bm25, у более релевантных постов она меньше,
+    поэтому оба поля идут по возрастанию. Если между запросами
+    страниц индекс изменится, оценки сдвинутся, и пост может
+    встретиться дважды или пропасть — для поиска это допустимо.
+    Выборка идёт из базы using (по умолчанию — куда направит роутер).
+    """
+
+    table = INDEXES[Post]
+
+    def __init__(self, query, per_page, using=None):
+        self.using = using or router.db_for_read(Post)
+        self.match = match_expression(query)
+        self.ordering = ('rank', 'id')
+        self.fields = ['rank', 'id']
+        self.descending = False
+        Paginator.__init__(self, Post.objects.none(), per_page)
+
+    def row_key(self, row):
+        return row[:2]
+
+    def item(self, row):
+        return row[2]
+
+    def cursor_value(self, name, value):
+        return float(value) if name == 'rank' else int(value)
+
+    def window(self, after=None, before=None):
+        if not self.match or not is_available():
+            return []
+        sql = (
+            f'SELECT rank, id FROM (SELECT bm25({self.table}) AS rank, '
+            f'rowid AS id FROM {self.table} WHERE {self.table} MATCH %s)'
+        )
+        params = [self.match]
+        cursor = before if before is not None else after
+        if cursor is not None:
+            sign = '<' if before is not None else '>'
+            sql += (
+                f' WHERE rank {sign} %s OR (rank = %s AND id {sign} %s)'
+            )
+            params += [cursor[0], cursor[0], cursor[1]]
+        order = 'DESC' if before is not None else 'ASC'
+        sql += f' ORDER BY rank {order}, id {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connections[self.using].cursor() as db:
+            db.execute(sql, params)
+            ranked = db.fetchall()
+        posts = Post.objects.using(self.using).select_related(
+            'author', 'group'
+        ).in_bulk(
+            [post_id for _, post_id in ranked]
+        )
+        return [
+            (rank, post_id, posts[post_id])
+            for rank, post_id in ranked if post_id in posts
+        ]
+
+    def legacy_page(self, number):
+        # Номеров страниц у поиска нет, ?page=N ведёт на первую.
+        return self.cursor_page()
+
+
+class MergedSearchPaginator(MergedCursorPaginator):
+    def legacy_page(self, number):
+        return self.cursor_page()
+
+
+def search_paginator(query, per_page):
+    """Пагинатор поиска по всем шардам постов.
+
+    Оценки bm25 считаются по статистике своего шарда, так что
+    на шардах разного размера порядок слияния приблизителен.
+    """
+    if not sharding.is_sharded():
+        return SearchPaginator(query, per_page)
+    return MergedSearchPaginator(
+        [
+            SearchPaginator(query, per_page, alias)
+            for alias in sharding.shards()
+        ],
+        per_page
+    )
@@ -0,0 +1,230 @@
+"""Шардирование постов и комментариев по автору.
+
+Посты автора живут на одном из шардов POST_SHARDS — алиасов
+в DATABASES с полной схемой; шард выбирается jump consistent hash
+от id автора. Комментарии лежат рядом со своим постом. Пользователи
+и группы копируются на все шарды, чтобы выборки с select_related
+и внешние ключи работали внутри одного шарда; подписки, счётчики
+пользователей, лента подписок и сессии остаются в основной базе.
+
+ShardRouter направляет запрос постов туда, где он может быть
+выполнен: объект, загруженный с шарда, — на его шард, новый пост —
+на шард автора, выборку постов автора — на его шард. Представления
+одного поста прилипают к шарду, на котором пост нашёлся (@post_shard).
+Общие ленты читают все шарды и сливают страницы по id
+(utils.feed_paginator).
+
+С одним шардом 'default' (по умолчанию) всё это выключено и
+запросы идут как раньше. После изменения POST_SHARDS посты
+переносит на новые места команда rebalance_shards.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from core.replicas import note_write
+
+from .models import Comment, Post
+
+SHARDED_MODELS = ('posts.post', 'posts.comment')
+# Модели, которые копируются на все шарды.
+MIRRORED_MODELS = ('auth.user', 'posts.group')
+
+_pinned = ContextVar('post_shard', default=None)
+
+
+def shards():
+    return list(settings.POST_SHARDS)
+
+
+def is_sharded():
+    return shards() != [DEFAULT_DB_ALIAS]
+
+
+def aliases():
+    """Алиасы, которые нужно обойти, чтобы увидеть все посты.
+
+    Без шардирования — [None]: выборка .using(None) идёт
+    по обычным правилам роутеров (в том числе на реплику).
+    """
+    return shards() if is_sharded() else [None]
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping, Veach): номер корзины для key.
+
+    При переходе от n к n + 1 корзинам в новую переезжает около
+    1 / (n + 1) ключей, остальные остаются на месте.
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for(author_id):
+    names = shards()
+    return names[jump_hash(author_id, len(names))]
+
+
+@contextmanager
+def pinned(alias):
+    """Запросы постов без подсказок внутри блока идут на шард alias."""
+    token = _pinned.set(alias)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _instance_shard(instance):
+    label = _label(instance.__class__)
+    if instance._state.adding:
+        # У нового объекта _state.db — просто база первого присвоенного
+        # ему связанного объекта, например группы.
+        if label == 'posts.post' and instance.author_id is not None:
+            return shard_for(instance.author_id)
+        if label == 'posts.comment':
+            post = Comment.post.field.get_cached_value(instance, None)
+            if post is not None and not post._state.adding:
+                return post._state.db
+    if instance._state.db in shards():
+        return instance._state.db
+    return None
+
+
+def route(model, hints):
+    """Шард для запроса к посту или комментарию или None."""
+    if not is_sharded() or _label(model) not in SHARDED_MODELS:
+        return None
+    instance = hints.get('instance')
+    if instance is not None:
+        # instance может быть ленивым request.user: type() его не видит.
+        label = _label(instance.__class__)
+        if label in SHARDED_MODELS:
+            alias = _instance_shard(instance)
+            if alias is not None:
+                return alias
+        elif label == 'auth.user' and _label(model) == 'posts.post':
+            # author.posts.all(): посты автора лежат на его шарде.
+            return shard_for(instance.pk)
+    return _pinned.get()
+
+
+class ShardRouter:
+    """Ставится в DATABASE_ROUTERS перед роутером реплик.
+
+    Запросы, для которых шард не определён, роутер пропускает
+    дальше: они идут в основную базу (или на реплику).
+    """
+
+    def db_for_read(self, model, **hints):
+        return route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        alias = route(model, hints)
+        if alias is not None:
+            # Роутер реплик этой записи не увидит.
+            note_write()
+        return alias
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not is_sharded():
+            return None
+        databases = {DEFAULT_DB_ALIAS, *shards()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            # Пользователи и группы есть на каждом шарде.
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def locate_key(post_id):
+    return f'post-shard:{post_id}'
+
+
+def locate(post_id):
+    """Шард, на котором лежит пост, или None без шардирования.
+
+    Ответ кэшируется; если поста нет нигде, возвращается основной
+    шард, чтобы представление ответило 404 как обычно.
+    """
+    if not is_sharded():
+        return None
+    key = locate_key(post_id)
+    alias = cache.get(key)
+    if alias in shards():
+        return alias
+    for alias in shards():
+        if Post.objects.using(alias).filter(pk=post_id).exists():
+            cache.set(key, alias, settings.POST_SHARD_CACHE_TIMEOUT)
+            return alias
+    return shards()[0]
+
+
+def remember(post):
+    if is_sharded():
+        cache.set(
+            locate_key(post.pk), post._state.db,
+            settings.POST_SHARD_CACHE_TIMEOUT
+        )
+
+
+def forget_locations(post_ids):
+    cache.delete_many([locate_key(post_id) for post_id in post_ids])
+
+
+def post_shard(view):
+    """Выполняет представление одного поста на шарде этого поста.
+
+    Ставится над @query_budget: поиск поста на холодном кэше стоит
+    до запроса на шард и к самому представлению не относится.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            post_id = int(kwargs['post_id'])
+        except (KeyError, TypeError, ValueError):
+            return view(request, *args, **kwargs)
+        with pinned(locate(post_id)):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+def mirror(instance):
+    """Копирует пользователя или группу из основной базы на шарды."""
+    model = type(instance)
+    values = {
+        field.attname: getattr(instance, field.attname)
+        for field in model._meta.concrete_fields if not field.primary_key
+    }
+    for alias in shards():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        manager = model._base_manager.using(alias)
+        if not manager.filter(pk=instance.pk).update(**values):
+            manager.bulk_create(
+                [model(pk=instance.pk, **values)], ignore_conflicts=True
+            )
+
+
+def unmirror(instance):
+    """Удаляет копии пользователя или группы вместе с их постами."""
+    for alias in shards():
+        if alias != DEFAULT_DB_ALIAS:
+            type(instance)._base_manager.using(alias).filter(
+                pk=instance.pk
+            ).delete()
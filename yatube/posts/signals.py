@@ -0,0 +1,148 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, following, sharding, thumbnails, timeline
+from .cache import bump_generations, card_keys, post_scopes
+from .models import Comment, Follow, Group, Post, User
+
+# Поля пользователя, которые видны в карточках его постов.
+SHOWN_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def after_commit(using, call, *args):
+    """Кладёт в кэш данные записи только после её фиксации в using."""
+    transaction.on_commit(partial(call, *args), using=using)
+
+
+def invalidate(using, call, *args):
+    """Сбрасывает кэш сразу и ещё раз после фиксации записи в using.
+
+    Второй сброс убирает то, что читатель успел закэшировать
+    под новым ключом до фиксации. Откат записи стоит только
+    лишнего промаха кэша.
+    """
+    call(*args)
+    after_commit(using, call, *args)
+
+
+@receiver(pre_save, sender=Post)
+def post_edited(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance.version += 1
+        instance._saved_group_id = Post.objects.using(
+            kwargs['using']
+        ).filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, using, **kwargs):
+    thumbnails.schedule(instance)
+    if created:
+        after_commit(using, sharding.remember, instance)
+        counters.post_created(instance)
+        timeline.push_post(instance)
+        scopes = post_scopes(instance, instance.group_id)
+    else:
+        saved_group_id = getattr(
+            instance, '_saved_group_id', instance.group_id
+        )
+        counters.post_moved(saved_group_id, instance.group_id)
+        scopes = post_scopes(instance, saved_group_id, instance.group_id)
+    invalidate(using, bump_generations, scopes)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, using, **kwargs):
+    counters.post_deleted(instance)
+    # После удаления у instance уже нет pk: ключи считаются сразу.
+    invalidate(using, cache.delete_many, card_keys(instance))
+    invalidate(
+        using, bump_generations, post_scopes(instance, instance.group_id)
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, using, **kwargs):
+    scopes = [f'group:{instance.slug}']
+    if not created:
+        # Название группы есть в карточках её постов во всех лентах.
+        scopes.append('all')
+        for alias in sharding.aliases():
+            scopes += [
+                f'author:{username}'
+                for username in Post.objects.using(alias).filter(
+                    group=instance
+                ).order_by().values_list(
+                    'author__username', flat=True
+                ).distinct()
+            ]
+    invalidate(using, bump_generations, scopes)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, using, **kwargs):
+    if created or update_fields and not (
+        SHOWN_USER_FIELDS & set(update_fields)
+    ):
+        return
+    # Имя автора есть в карточках его постов во всех лентах.
+    slugs = instance.posts.exclude(group=None).order_by().values_list(
+        'group__slug', flat=True
+    ).distinct()
+    invalidate(using, bump_generations, [
+        'all',
+        f'author:{instance.username}',
+        *(f'group:{slug}' for slug in slugs),
+    ])
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_post(instance.post_id, 1, kwargs['using'])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1, kwargs['using'])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def mirrored_saved(sender, instance, raw, using, **kwargs):
+    if sharding.is_sharded() and using == DEFAULT_DB_ALIAS and not raw:
+        sharding.mirror(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def mirrored_deleted(sender, instance, using, **kwargs):
+    if sharding.is_sharded() and using == DEFAULT_DB_ALIAS:
+        sharding.unmirror(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, using, **kwargs):
+    if created:
+        counters.follow_changed(instance, 1)
+        invalidate(using, following.followed, instance)
+        timeline.followed(instance)
+        invalidate(
+            using, bump_generations, [f'author:{instance.author.username}']
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, using, **kwargs):
+    counters.follow_changed(instance, -1)
+    invalidate(using, following.unfollowed, instance)
+    timeline.unfollowed(instance)
+    invalidate(
+        using, bump_generations, [f'author:{instance.author.username}']
+    )
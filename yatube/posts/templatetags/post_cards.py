@@ -0,0 +1,51 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from .. import thumbnails
+from ..cache import card_key
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/posts_list.html'
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, variant='feed'):
+    """HTML карточек постов страницы из кэша фрагментов.
+
+    Кэш читается одним get_many на страницу, промахи рендерятся
+    и записываются одним set_many. Ключ включает версию правки
+    и группу поста, имена автора и группы, поэтому правка, перенос
+    и переименования сами уводят карточку из кэша. Карточки
+    с заглушкой вместо миниатюры не кэшируются. variant — вид
+    карточки из CARD_VARIANTS, его выбирает шаблон страницы.
+    """
+    posts = list(posts)
+    keys = [card_key(post, variant) for post in posts]
+    cards = cache.get_many(keys)
+    missed = {}
+    card_template = context.template.engine.get_template(CARD_TEMPLATE)
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            with context.push(post=post, card_variant=variant):
+                cards[key] = card_template.render(context)
+            if not post.image or thumbnails.ready_thumbnail(post.image):
+                missed[key] = cards[key]
+    if missed:
+        cache.set_many(missed, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+@register.filter
+def post_thumbnail(image):
+    """Готовая миниатюра картинки поста или None.
+
+    Если миниатюры ещё нет, она ставится в очередь на генерацию,
+    а шаблон показывает заглушку.
+    """
+    thumbnail = thumbnails.ready_thumbnail(image)
+    if thumbnail is None:
+        thumbnails.schedule(image.instance)
+    return thumbnail
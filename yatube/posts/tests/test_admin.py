@@ -0,0 +1,122 @@
+from django.contrib.admin import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ScalableAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.source = Group.objects.create(
+            title='Откуда', slug='source', description='Описание'
+        )
+        cls.target = Group.objects.create(
+            title='Куда', slug='target', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def create_posts(self, count):
+        start = User.objects.count()
+        for number in range(start, start + count):
+            author = User.objects.create_user(username=f'author{number}')
+            post = Post.objects.create(
+                text=f'Пост {number}', author=author, group=self.source
+            )
+            Comment.objects.create(post=post, author=author, text='Да')
+            Follow.objects.create(user=self.admin, author=author)
+
+    def changelist_queries(self, model):
+        url = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(context)
+
+    def test_changelists_have_no_n_plus_one(self):
+        """Число запросов списков не растёт с числом строк."""
+        self.create_posts(2)
+        before = {
+            model: self.changelist_queries(model)
+            for model in ('post', 'comment', 'follow')
+        }
+        self.create_posts(3)
+        for model, queries in before.items():
+            with self.subTest(model=model):
+                self.assertEqual(self.changelist_queries(model), queries)
+
+    def test_no_full_count(self):
+        """Список не считает строки всей таблицы без ограничения."""
+        self.create_posts(2)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'),
+                {'group__id__exact': self.source.pk}
+            )
+        self.assertEqual(response.context['cl'].result_count, 2)
+        self.assertIsNone(response.context['cl'].full_result_count)
+        counts = [
+            query['sql'] for query in context.captured_queries
+            if 'COUNT(' in query['sql']
+        ]
+        self.assertTrue(counts)
+        for sql in counts:
+            self.assertIn('LIMIT', sql)
+
+    def test_move_to_group_action(self):
+        """Действие переносит посты и поправляет счётчики групп."""
+        self.create_posts(3)
+        posts = list(Post.objects.order_by('id')[:2])
+        etag = self.client.get(
+            reverse('posts:post_detail', args=(posts[0].pk,))
+        )['ETag']
+        source_page = self.client.get(
+            reverse('posts:group_list', args=(self.source.slug,))
+        )
+        self.assertEqual(len(source_page.context['page_obj']), 3)
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'action': 'move_to_group',
+                'group': self.target.pk,
+                ACTION_CHECKBOX_NAME: [post.pk for post in posts],
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            Post.objects.filter(group=self.target).count(), 2
+        )
+        self.source.refresh_from_db()
+        self.target.refresh_from_db()
+        self.assertEqual(self.source.posts_count, 1)
+        self.assertEqual(self.target.posts_count, 2)
+        for post in posts:
+            version = post.version
+            post.refresh_from_db()
+            self.assertEqual(post.version, version + 1)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(posts[0].pk,)),
+            HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            reverse('posts:group_list', args=(self.source.slug,))
+        )
+        self.assertEqual(len(response.context['page_obj']), 1)
+        response = self.client.get(
+            reverse('posts:group_list', args=(self.target.slug,))
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
@@ -0,0 +1,130 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(POSTS_PER_PAGE=2, COMMENTS_PER_PAGE=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+            for number in range(3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_page_by_cursor(self):
+        """Ленты отдают одинаковые компактные строки и листаются курсором."""
+        feeds = {
+            'index': reverse('posts:api_index'),
+            'group': reverse('posts:api_group_posts', args=('group',)),
+            'profile': reverse('posts:api_profile', args=('author',)),
+            'follow': reverse('posts:api_follow_index'),
+        }
+        newest = self.posts[-1]
+        for name, url in feeds.items():
+            with self.subTest(feed=name):
+                first = self.reader_client.get(url).json()
+                self.assertEqual(first['results'][0], {
+                    'id': str(newest.pk),
+                    'text': newest.text,
+                    'pub_date': first['results'][0]['pub_date'],
+                    'author': 'author',
+                    'group': 'group',
+                    'image': None,
+                })
+                self.assertEqual(len(first['results']), 2)
+                second = self.reader_client.get(first['next']).json()
+                self.assertEqual(
+                    [row['id'] for row in second['results']],
+                    [str(self.posts[0].pk)]
+                )
+                self.assertIsNone(second['next'])
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок без авторизации отвечает 401."""
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_unchanged_feed_returns_304_without_queries(self):
+        """Неизменившаяся лента отдаёт 304, не выбирая посты."""
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Post.objects.create(text='Новый', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_feed_rows_have_no_comment_counts(self):
+        """Строки лент без числа комментариев: его смена не меняет ETag
+        ленты. Число есть у отдельного поста."""
+        post = self.posts[-1]
+        url = reverse('posts:api_index')
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        row = self.client.get(url).json()['results'][0]
+        self.assertNotIn('comments_count', row)
+        detail = self.client.get(
+            reverse('posts:api_post_detail', args=(post.pk,))
+        ).json()
+        self.assertEqual(detail['comments_count'], 1)
+        # Snowflake-id больше 2 ** 53 и в JSON идёт строкой.
+        self.assertGreater(post.pk, 2 ** 53)
+        self.assertEqual(detail['id'], str(post.pk))
+
+    def test_post_and_comments_etag_follow_changes(self):
+        """ETag поста и комментариев меняется с новым комментарием."""
+        post = self.posts[0]
+        urls = (
+            reverse('posts:api_post_detail', args=(post.pk,)),
+            reverse('posts:api_post_comments', args=(post.pk,)),
+        )
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        for url, etag in zip(urls, etags):
+            self.assertEqual(
+                self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                304
+            )
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        comments = self.client.get(urls[1]).json()['results']
+        self.assertEqual(
+            [(row['text'], row['author']) for row in comments],
+            [('Ок', 'reader')]
+        )
+
+    def test_missing_objects_404(self):
+        """Несуществующие группа, автор и пост отвечают 404."""
+        for url in (
+            reverse('posts:api_group_posts', args=('missing',)),
+            reverse('posts:api_profile', args=('missing',)),
+            reverse('posts:api_post_detail', args=(0,)),
+            reverse('posts:api_post_comments', args=(0,)),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
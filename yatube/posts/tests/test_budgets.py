@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import URLResolver, reverse
+
+from posts import urls, views
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class ViewBudgetsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='budget-reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='budget-group', description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='budget-other', description='Описание'
+        )
+        cls.author = User.objects.create_user(username='budget-author')
+        for number in range(12):
+            author = User.objects.create_user(username=f'budget-{number}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(
+                author=author,
+                group=cls.group,
+                text=f'Пост {number}'
+            )
+            Post.objects.create(
+                author=cls.author,
+                group=cls.other_group if number % 2 else None,
+                text=f'Пост автора {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_every_view_has_budget(self):
+        """У каждого представления posts.views объявлен бюджет."""
+        callbacks = [
+            pattern.callback for pattern in urls.urlpatterns
+            if not isinstance(pattern, URLResolver)
+            and pattern.callback.__module__ == views.__name__
+        ]
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            with self.subTest(view=callback.__name__):
+                self.assertTrue(hasattr(callback, 'query_budget'))
+
+    def test_feeds_within_budget(self):
+        """Ленты с разными авторами и группами укладываются в бюджет."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        # Все двенадцать авторов подписок — «звёзды», чьи посты
+        # подмешиваются при чтении.
+        with self.settings(TIMELINE_FANOUT_LIMIT=0):
+            cache.clear()
+            response = self.client.get(reverse('posts:follow_index'))
+            self.assertEqual(response.status_code, 200)
@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..cache import card_key
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Первая версия',
+            author=self.author,
+            group=self.group
+        )
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_card_is_cached_and_reused(self):
+        """Карточка кэшируется и берётся из кэша на странице группы."""
+        self.client.get(reverse('posts:index'))
+        key = card_key(self.post, 'feed')
+        self.assertIn('Первая версия', cache.get(key))
+        cache.set(key, 'карточка из кэша')
+        response = self.client.get(
+            reverse('posts:group_list', args=(self.group.slug,))
+        )
+        self.assertContains(response, 'карточка из кэша')
+
+    def test_edit_invalidates_card(self):
+        """После правки поста лента показывает новую версию карточки."""
+        self.client.get(reverse('posts:index'))
+        self.author_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            data={'text': 'Вторая версия', 'group': self.group.pk}
+        )
+        response = self.client.get(
+            reverse('posts:group_list', args=(self.group.slug,))
+        )
+        self.assertContains(response, 'Вторая версия')
+        self.assertNotContains(response, 'Первая версия')
+
+    def test_renames_refresh_cards(self):
+        """Переименование группы и автора видно в закэшированных лентах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+        for url in urls:
+            self.client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Лев'
+        author.last_name = 'Толстой'
+        author.save()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Новое название')
+                if url == urls[-1]:
+                    self.assertNotContains(response, 'Автор: Лев Толстой')
+                else:
+                    self.assertContains(response, 'Автор: Лев Толстой')
+
+    def test_delete_forgets_card(self):
+        """Удаление поста удаляет его карточку из кэша."""
+        self.client.get(reverse('posts:index'))
+        key = card_key(self.post, 'feed')
+        self.post.delete()
+        self.assertIsNone(cache.get(key))
+
+
+class FeedGenerationCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.feeds = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        )
+
+    def test_feed_pages_are_cached(self):
+        """Страницы лент отдаются из кэша, пока поколение не сменилось."""
+        for url in self.feeds:
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    self.client.get(url)
+
+    def test_new_post_shows_up_immediately(self):
+        """Новый пост сразу виден во всех закэшированных лентах."""
+        for url in self.feeds:
+            self.client.get(url)
+        Post.objects.create(
+            text='Свежий пост',
+            author=self.author,
+            group=self.group
+        )
+        for url in self.feeds:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_follow_refreshes_profile(self):
+        """После подписки профиль автора показывает кнопку отписки."""
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.assertFalse(self.reader_client.get(url).context['following'])
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        self.assertTrue(self.reader_client.get(url).context['following'])
+
+    def test_pages_are_cached_per_user(self):
+        """Закэшированная страница не показывается другому пользователю."""
+        self.reader_client.get(reverse('posts:index'))
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')),
+            'Пользователь: reader'
+        )
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentsPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Пост', author=cls.author)
+        cls.url = reverse('posts:post_detail', args=(cls.post.pk,))
+
+    def add_comments(self, count):
+        for number in range(count):
+            commenter = User.objects.create_user(
+                username=f'commenter{Comment.objects.count()}'
+            )
+            Comment.objects.create(
+                post=self.post, author=commenter, text=f'Коммент {number}'
+            )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        return len(queries)
+
+    def test_first_page_inline_and_authors_shown(self):
+        """Первая страница — новые комментарии с их авторами."""
+        self.add_comments(5)
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(
+            list(comments),
+            list(Comment.objects.order_by('-created', '-id')[:3])
+        )
+        self.assertContains(response, 'commenter4')
+        self.assertIsNotNone(comments.next_cursor)
+
+    def test_load_more_fragment(self):
+        """Фрагмент «Показать ещё» отдаёт следующую страницу."""
+        self.add_comments(5)
+        first = self.client.get(self.url).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'after': first.next_cursor}
+        )
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(
+            list(response.context['comments']),
+            list(Comment.objects.order_by('-created', '-id')[3:])
+        )
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_page_cost_does_not_grow(self):
+        """Число запросов страницы поста не зависит от числа комментариев."""
+        self.add_comments(4)
+        queries = self.count_queries()
+        self.add_comments(10)
+        self.assertEqual(self.count_queries(), queries)
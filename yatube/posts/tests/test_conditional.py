@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+
+    def test_unchanged_page_returns_304_without_rendering(self):
+        """Совпавший ETag даёт 304 без рендеринга шаблонов."""
+        for url in self.pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_feed_304_costs_no_queries(self):
+        """Для лент проверка ETag не ходит в базу."""
+        for url in self.pages[:3]:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_users_get_own_variants(self):
+        """ETag страницы у анонима и у пользователя разный."""
+        for url in self.pages:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.author_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Пользователь: author')
+
+    def test_changes_invalidate_validators(self):
+        """Правка поста и новый комментарий меняют ETag страниц."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.pages}
+        self.author_client.post(
+            reverse('posts:post_edit', args=(self.post.pk,)),
+            data={'text': 'Правка', 'group': self.group.pk}
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertContains(response, 'Правка')
+        url = self.pages[-1]
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Комментарий')
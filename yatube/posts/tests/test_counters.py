@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserCounter
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-group',
+            description='Описание'
+        )
+
+    def counters(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики."""
+        post = Post.objects.create(
+            text='Пост',
+            author=self.author,
+            group=self.group
+        )
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_counter_survives_post_edit(self):
+        """Правка поста не затирает счётчик комментариев."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(text='Раз', post=post, author=self.reader)
+        post.text = 'Исправленный пост'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обоих пользователей."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        post = Post.objects.create(
+            text='Пост',
+            author=self.author,
+            group=self.group
+        )
+        Comment.objects.create(text='Раз', post=post, author=self.reader)
+        UserCounter.objects.filter(user=self.author).update(posts_count=7)
+        Group.objects.filter(pk=self.group.pk).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comments_count=7)
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..following import (
+    followed_ids,
+    following_among,
+    following_key,
+    is_following
+)
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowingCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def fresh_reader(self):
+        return User.objects.get(pk=self.reader.pk)
+
+    def test_follow_state_without_queries(self):
+        """После первой загрузки проверки подписок не ходят в базу."""
+        Follow.objects.create(user=self.reader, author=self.authors[2])
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        followed_ids(self.fresh_reader())
+        reader = self.fresh_reader()
+        with self.assertNumQueries(0):
+            self.assertTrue(is_following(reader, self.authors[0].pk))
+            self.assertFalse(is_following(reader, self.authors[1].pk))
+            self.assertEqual(
+                following_among(
+                    reader, [author.pk for author in self.authors]
+                ),
+                {self.authors[0].pk, self.authors[2].pk}
+            )
+
+    def test_follow_and_unfollow_reset_cache(self):
+        """Подписка и отписка сбрасывают закэшированное множество."""
+        followed_ids(self.fresh_reader())
+        author = self.authors[1]
+        self.client.get(
+            reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assertTrue(Follow.objects.filter(author=author).exists())
+        self.assertIsNone(cache.get(following_key(self.reader.pk)))
+        self.assertTrue(is_following(self.fresh_reader(), author.pk))
+        self.client.get(
+            reverse('posts:profile_unfollow', args=(author.username,))
+        )
+        self.assertFalse(Follow.objects.filter(author=author).exists())
+        self.assertIsNone(cache.get(following_key(self.reader.pk)))
+        self.assertFalse(is_following(self.fresh_reader(), author.pk))
+
+    def test_stale_cache_does_not_break_follow(self):
+        """Повторная подписка при устаревшем кэше не падает."""
+        author = self.authors[0]
+        Follow.objects.create(user=self.reader, author=author)
+        cache.clear()
+        followed_ids(self.fresh_reader())
+        Follow.objects.filter(author=author).delete()
+        Follow.objects.bulk_create([Follow(user=self.reader, author=author)])
+        response = self.client.get(
+            reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Follow.objects.filter(author=author).count(), 1)
+        self.assertTrue(is_following(self.fresh_reader(), author.pk))
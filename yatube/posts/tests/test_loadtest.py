@@ -0,0 +1,67 @@
+import random
+from io import StringIO
+
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+from faker import Faker
+
+from ..management.commands.loadtest import (
+    Command,
+    compare,
+    percentile,
+    summarize
+)
+from ..models import Comment, Follow, Group, Post
+
+
+class LoadTestStatsTest(SimpleTestCase):
+    def test_percentile(self):
+        """Перцентиль берётся по ближайшему рангу."""
+        ordered = list(range(1, 101))
+        self.assertEqual(percentile(ordered, 0.5), 50)
+        self.assertEqual(percentile(ordered, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_summarize(self):
+        """Сводка считает ошибки, запросы в секунду и гистограмму."""
+        stats = summarize([(3, True), (1, True), (30, False)], duration=3)
+        self.assertEqual(stats['count'], 3)
+        self.assertEqual(stats['errors'], 1)
+        self.assertEqual(stats['rps'], 1.0)
+        self.assertEqual(stats['max_ms'], 30)
+        self.assertEqual(sum(stats['histogram']), 3)
+
+    def test_compare_flags_p99_regression(self):
+        """Рост p99 сверх допуска отмечается как регрессия."""
+        baseline = {
+            'index': {'p50_ms': 10, 'p99_ms': 20, 'rps': 100},
+            'profile': {'p50_ms': 10, 'p99_ms': 20, 'rps': 100},
+        }
+        current = {
+            'index': {'p50_ms': 11, 'p99_ms': 23, 'rps': 95},
+            'profile': {'p50_ms': 12, 'p99_ms': 30, 'rps': 80},
+            'post_create': {'p50_ms': 12, 'p99_ms': 30, 'rps': 80},
+        }
+        lines, regressions = compare(current, baseline, tolerance=0.2)
+        self.assertEqual(regressions, ['profile'])
+        self.assertEqual(len(lines), 3)
+
+
+class LoadTestSeedTest(TestCase):
+    def test_seed(self):
+        """Засев создаёт связанный набор данных без подписок на себя."""
+        faker = Faker('ru_RU')
+        faker.seed_instance(1)
+        users = Command(stdout=StringIO()).seed(random.Random(1), faker, {
+            'users': 5, 'groups': 2, 'posts': 20,
+            'comments': 10, 'follows': 2,
+        })
+        self.assertEqual(len(users), 5)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertEqual(Comment.objects.count(), 10)
+        self.assertEqual(Follow.objects.count(), 10)
+        self.assertFalse(
+            Follow.objects.filter(user=F('author')).exists()
+        )
@@ -0,0 +1,116 @@
+import re
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..utils import COMMENT_ORDERING, FEED_ORDERING, CursorPaginator
+
+User = get_user_model()
+
+# Полный проход по таблице: «SCAN t» без индекса в плане SQLite.
+FULL_SCAN = re.compile(r'\bSCAN (TABLE )?\w+$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост',
+            author=cls.author,
+            group=cls.group
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Comment.objects.create(
+            text='Комментарий',
+            post=cls.post,
+            author=cls.user
+        )
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, queryset, ordered_scan=None):
+        """ordered_scan — таблица, которую можно читать по первичному
+        ключу: без сортировки такой проход кончается на LIMIT."""
+        for line in self.plan(queryset):
+            if line != f'SCAN {ordered_scan}':
+                self.assertIsNone(
+                    FULL_SCAN.search(line),
+                    f'Полный проход по таблице: {line}'
+                )
+            self.assertNotIn(
+                'TEMP B-TREE', line, f'Сортировка без индекса: {line}'
+            )
+
+    def feed_windows(self, queryset, ordering=FEED_ORDERING):
+        """Выборки первой страницы и страниц по курсору вперёд и назад."""
+        paginator = CursorPaginator(
+            queryset, settings.POSTS_PER_PAGE, ordering
+        )
+        key = paginator.row_key(paginator.object_list.first())
+        return {
+            'first': paginator.object_list,
+            'after': paginator.object_list.filter(
+                paginator._seek(key, forward=True)
+            ),
+            'before': paginator.object_list.filter(
+                paginator._seek(key, forward=False)
+            ).reverse(),
+        }
+
+    def test_feeds_use_indexes(self):
+        """Все ленты читаются по индексу без сортировки."""
+        feeds = {
+            'index': Post.objects.select_related('author', 'group'),
+            'group_posts': self.group.posts.select_related('author'),
+            'profile': self.author.posts.select_related('author'),
+        }
+        for name, queryset in feeds.items():
+            for kind, window in self.feed_windows(queryset).items():
+                with self.subTest(feed=name, page=kind):
+                    self.assert_indexed(
+                        window,
+                        Post._meta.db_table if name == 'index' else None
+                    )
+
+    def test_follow_index_uses_timeline_index(self):
+        """Лента подписок читается по индексу материализованной ленты."""
+        queryset = TimelineEntry.objects.filter(
+            user=self.user
+        ).select_related('post__author', 'post__group')
+        windows = self.feed_windows(queryset, ('-post_id',))
+        for kind, window in windows.items():
+            with self.subTest(page=kind):
+                self.assert_indexed(window)
+
+    def test_comments_and_follows_use_indexes(self):
+        """Комментарии поста и подписки читаются по индексу."""
+        querysets = {
+            'comments': Comment.objects.filter(post=self.post).order_by(
+                *COMMENT_ORDERING
+            ),
+            'following': Follow.objects.filter(
+                user=self.user,
+                author=self.author
+            ),
+            'followers': Follow.objects.filter(author=self.author),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(queryset=name):
+                self.assert_indexed(queryset)
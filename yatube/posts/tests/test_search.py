@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..search import filter_matching, match_expression
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.rare = Post.objects.create(
+            text='Ёжик в тумане',
+            author=self.author
+        )
+        self.frequent = Post.objects.create(
+            text='Ёжики, ёжики и ещё раз ёжики',
+            author=self.author
+        )
+        Post.objects.create(text='Про котов', author=self.author)
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def test_results_are_ranked(self):
+        """Поиск находит посты по префиксу слова без учёта регистра."""
+        page = self.search('ёжик').context['page_obj']
+        self.assertEqual(list(page), [self.frequent, self.rare])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Правка и удаление поста сразу отражаются в поиске."""
+        self.rare.text = 'Туман над рекой'
+        self.rare.save()
+        self.assertEqual(list(self.search('ёжик').context['page_obj']),
+                         [self.frequent])
+        self.frequent.delete()
+        self.assertEqual(len(self.search('ёжик').context['page_obj']), 0)
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_keyset_paging(self):
+        """Страницы выдачи листаются курсором вперёд и назад."""
+        first = self.search('ёжик').context['page_obj']
+        second = self.search(
+            'ёжик', after=first.next_cursor
+        ).context['page_obj']
+        self.assertEqual(list(second), [self.rare])
+        self.assertIsNone(second.next_cursor)
+        back = self.search(
+            'ёжик', before=second.previous_cursor
+        ).context['page_obj']
+        self.assertEqual(list(back), [self.frequent])
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 в строке поиска не ломают запрос."""
+        self.assertEqual(match_expression('ёж OR "кот*'), '"ёж"* "OR"* "кот"*')
+        response = self.search('NEAR( "* -кот')
+        self.assertEqual(response.status_code, 200)
+
+    def test_comments_are_indexed(self):
+        """Комментарии ищутся по своему индексу."""
+        comment = Comment.objects.create(
+            post=self.rare, author=self.author, text='Лошадка!'
+        )
+        self.assertEqual(
+            list(filter_matching(Comment.objects.all(), 'лошадк')),
+            [comment]
+        )
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через индекс, а не через LIKE."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'ёжик'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.rare, self.frequent}
+        )
@@ -0,0 +1,295 @@
+import io
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+from django.contrib.admin import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core import writer
+from posts import sharding
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SHARD = 'shard-test'
+SHARDS = ['default', SHARD]
+
+
+class JumpHashTest(SimpleTestCase):
+    def test_one_bucket(self):
+        """С одной корзиной все ключи попадают в неё."""
+        self.assertEqual(
+            {sharding.jump_hash(key, 1) for key in range(100)}, {0}
+        )
+
+    def test_keys_spread_evenly(self):
+        """Ключи расходятся по корзинам примерно поровну."""
+        counts = Counter(sharding.jump_hash(key, 4) for key in range(10000))
+        self.assertEqual(set(counts), {0, 1, 2, 3})
+        self.assertTrue(
+            all(2200 < count < 2800 for count in counts.values())
+        )
+
+    def test_new_bucket_takes_only_its_share(self):
+        """Новая корзина забирает около 1 / n ключей и только себе."""
+        moved = [
+            key for key in range(10000)
+            if sharding.jump_hash(key, 3) != sharding.jump_hash(key, 4)
+        ]
+        self.assertEqual(
+            {sharding.jump_hash(key, 4) for key in moved}, {3}
+        )
+        self.assertTrue(2200 < len(moved) < 2800)
+
+    def test_single_shard_is_default(self):
+        """По умолчанию шардирование выключено."""
+        self.assertFalse(sharding.is_sharded())
+        self.assertEqual(sharding.aliases(), [None])
+
+
+@override_settings(POST_SHARDS=SHARDS)
+class ShardTestCase(TestCase):
+    """Тесты со вторым шардом — временной базой SQLite."""
+
+    databases = {'default', SHARD}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[SHARD] = {
+            'ENGINE': 'core.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'shard.sqlite3'),
+        }
+        connections.ensure_defaults(SHARD)
+        connections.prepare_test_settings(SHARD)
+        with override_settings(POST_SHARDS=SHARDS):
+            call_command('migrate', database=SHARD, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[SHARD].close()
+        del connections[SHARD]
+        del connections.databases[SHARD]
+        shutil.rmtree(cls.directory)
+
+    @classmethod
+    def setUpTestData(cls):
+        # По автору на каждый шард.
+        cls.authors = {}
+        number = 0
+        while len(cls.authors) < len(SHARDS):
+            user = User.objects.create_user(username=f'author-{number}')
+            cls.authors.setdefault(sharding.shard_for(user.pk), user)
+            number += 1
+        cls.reader = User.objects.create_user(username='reader')
+
+
+class ShardRoutingTest(ShardTestCase):
+    def test_users_mirrored(self):
+        """Пользователи копируются на шард."""
+        self.assertTrue(
+            User.objects.using(SHARD).filter(username='reader').exists()
+        )
+
+    def test_post_and_comments_live_on_author_shard(self):
+        """Пост пишется на шард автора, комментарии — рядом с ним."""
+        author = self.authors[SHARD]
+        post = Post.objects.create(author=author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        self.assertEqual(post._state.db, SHARD)
+        self.assertEqual(comment._state.db, SHARD)
+        self.assertFalse(Post.objects.using('default').exists())
+        self.assertEqual(list(author.posts.all()), [post])
+        self.assertEqual(list(post.comments.all()), [comment])
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_locate(self):
+        """locate находит шард поста."""
+        post = Post.objects.create(author=self.authors[SHARD], text='Пост')
+        self.assertEqual(sharding.locate(post.pk), SHARD)
+
+
+class ShardedViewsTest(ShardTestCase):
+    def setUp(self):
+        self.posts = [
+            Post.objects.create(
+                author=self.authors[alias], text=f'Пост {alias}'
+            )
+            for alias in SHARDS * 2
+        ]
+        self.client.force_login(self.reader)
+
+    def assertFeed(self, response, posts):
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in sorted(posts, key=lambda post: -post.pk)]
+        )
+
+    def test_index_merges_shards(self):
+        """Главная сливает посты всех шардов по id."""
+        self.assertFeed(self.client.get(reverse('posts:index')), self.posts)
+
+    def test_profile_reads_author_shard(self):
+        """Профиль читает только шард автора."""
+        author = self.authors[SHARD]
+        response = self.client.get(
+            reverse('posts:profile', args=[author.username])
+        )
+        self.assertFeed(
+            response, [post for post in self.posts if post.author == author]
+        )
+
+    def test_follow_index_merges_shards(self):
+        """Лента подписок собирается с шардов всех авторов."""
+        for author in self.authors.values():
+            Follow.objects.create(user=self.reader, author=author)
+        self.assertFeed(
+            self.client.get(reverse('posts:follow_index')), self.posts
+        )
+
+    def test_comment_on_other_shard(self):
+        """Страница поста и комментарий работают для поста не в default."""
+        post = self.posts[1]
+        self.client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Привет'}
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertEqual(response.context['post'], post)
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Привет']
+        )
+        self.assertTrue(
+            Comment.objects.using(SHARD).filter(text='Привет').exists()
+        )
+
+    def test_search_merges_shards(self):
+        """Поиск находит посты на всех шардах."""
+        response = self.client.get(reverse('posts:search'), {'q': 'пост'})
+        self.assertEqual(
+            {post.pk for post in response.context['page_obj']},
+            {post.pk for post in self.posts}
+        )
+
+    def test_api_post_detail(self):
+        """API отдаёт пост с его шарда."""
+        post = self.posts[1]
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=[post.pk])
+        )
+        self.assertEqual(response.json()['id'], str(post.pk))
+
+
+class ShardedWriterTest(ShardTestCase):
+    def test_failed_job_rolls_back_shard_writes(self):
+        """Ошибка записи пачки откатывает и её запись на шард."""
+        author = self.authors[SHARD]
+
+        def failing():
+            Post.objects.create(author=author, text='Откатится')
+            raise ValueError
+
+        jobs = [
+            writer.Job(failing),
+            writer.Job(lambda: Post.objects.create(author=author, text='Да')),
+        ]
+        writer.commit(jobs)
+        self.assertIsInstance(jobs[0].error, ValueError)
+        self.assertEqual(
+            list(Post.objects.using(SHARD).values_list('text', flat=True)),
+            ['Да']
+        )
+
+
+class ShardedAdminTest(ShardTestCase):
+    def setUp(self):
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            author=self.authors[SHARD], text='Пост на шарде'
+        )
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+
+    def test_changelist_shows_selected_shard(self):
+        """Список постов показывает выбранный шард."""
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count, 0)
+        response = self.client.get(url, {'shard': SHARD})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post]
+        )
+
+    def test_change_pages_open_object_shard(self):
+        """Страницы поста и комментария открываются с их шарда."""
+        for name, obj in (('post', self.post), ('comment', self.comment)):
+            with self.subTest(model=name):
+                response = self.client.get(
+                    reverse(f'admin:posts_{name}_change', args=[obj.pk])
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['original'], obj)
+
+    def test_move_to_group_on_shard(self):
+        """Действие переносит посты на шарде и правит счётчик группы."""
+        response = self.client.post(
+            reverse('admin:posts_post_changelist') + f'?shard={SHARD}',
+            {
+                'action': 'move_to_group',
+                'group': self.group.pk,
+                ACTION_CHECKBOX_NAME: [self.post.pk],
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.group_id, self.group.pk)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+
+
+class RebalanceShardsTest(ShardTestCase):
+    def test_moves_posts_to_author_shards(self):
+        """rebalance_shards переносит посты с комментариями на шард
+        автора; повторный запуск ничего не переносит."""
+        author = self.authors[SHARD]
+        with override_settings(POST_SHARDS=['default']):
+            post = Post.objects.create(author=author, text='Пост')
+            Comment.objects.create(post=post, author=self.reader, text='Да')
+            stay = Post.objects.create(
+                author=self.authors['default'], text='Пост'
+            )
+        self.assertEqual(post._state.db, 'default')
+        call_command('rebalance_shards', stdout=io.StringIO())
+        self.assertEqual(
+            list(Post.objects.using(SHARD).values_list('pk', flat=True)),
+            [post.pk]
+        )
+        self.assertEqual(
+            list(Post.objects.using('default').values_list('pk', flat=True)),
+            [stay.pk]
+        )
+        moved = Post.objects.using(SHARD).get()
+        self.assertEqual(moved.pub_date, post.pub_date)
+        self.assertEqual(moved.comments.get().text, 'Да')
+        out = io.StringIO()
+        call_command('rebalance_shards', stdout=out)
+        self.assertIn('перенесено 0 постов', out.getvalue())
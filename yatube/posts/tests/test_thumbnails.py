@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import thumbnails
+from ..cache import card_key
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.author,
+            image=SimpleUploadedFile(
+                name='small.gif',
+                content=(
+                    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                    b'\x0A\x00\x3B'
+                ),
+                content_type='image/gif'
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_is_built(self):
+        """Без миниатюры показывается заглушка, карточка не кэшируется."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'aspect-ratio')
+        self.assertNotContains(response, '<img class="card-img')
+        self.assertIsNone(cache.get(card_key(self.post, 'feed')))
+
+    def test_built_thumbnail_replaces_placeholder(self):
+        """Построенная миниатюра сразу видна в закэшированной ленте."""
+        self.client.get(reverse('posts:index'))
+        self.assertTrue(thumbnails.build(self.post.pk, self.post.image.name))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<img class="card-img')
+        self.assertFalse(
+            thumbnails.build(self.post.pk, self.post.image.name)
+        )
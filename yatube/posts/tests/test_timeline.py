@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            text='Пост до подписки',
+            author=cls.author
+        )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow_page(self):
+        return self.reader_client.get(
+            reverse('posts:follow_index')
+        ).context['page_obj']
+
+    def test_follow_backfills_and_post_fans_out(self):
+        """Подписка добавляет старые посты, новый пост попадает в ленту."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        new_post = Post.objects.create(
+            text='Пост после подписки',
+            author=self.author
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(list(self.follow_page()), [new_post, self.old_post])
+
+    def test_unfollow_trims_timeline(self):
+        """После отписки посты автора убираются из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(len(self.follow_page()), 0)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_crossing_fanout_limit(self):
+        """Автор за порогом уходит из разложенных лент, а вернувшись
+        под порог, раскладывает туда и посты, вышедшие за это время."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.author).exists()
+        )
+        new_post = Post.objects.create(
+            text='Пост популярного автора',
+            author=self.author
+        )
+        self.assertEqual(list(self.follow_page()), [new_post, self.old_post])
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader
+            ).values_list('post_id', flat=True)),
+            {new_post.pk, self.old_post.pk}
+        )
+        self.assertEqual(list(self.follow_page()), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_is_pulled_on_read(self):
+        """Посты популярного автора не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(
+            text='Пост популярного автора',
+            author=self.author
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(list(self.follow_page()), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_several_pulled_authors_cost_one_query(self):
+        """Посты нескольких популярных авторов идут по убыванию id,
+        а число запросов не растёт с числом таких подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        with CaptureQueriesContext(connection) as one_author:
+            self.follow_page()
+        authors = [
+            User.objects.create_user(username=f'star{number}')
+            for number in range(3)
+        ]
+        for author in authors:
+            Follow.objects.create(user=self.reader, author=author)
+        posts = [
+            Post.objects.create(text=str(number), author=author)
+            for number in range(2)
+            for author in authors
+        ]
+        cache.clear()
+        with CaptureQueriesContext(connection) as many_authors:
+            page = self.follow_page()
+        self.assertEqual(
+            list(page), list(reversed(posts)) + [self.old_post]
+        )
+        self.assertEqual(len(many_authors), len(one_author))
@@ -382,3 +382,39 @@ class PaginatorViewsTest(TestCase):
             len(response.context['page_obj']),
             self.posts_on_second_page
         )
+
+    def test_index_next_cursor_contains_rest_posts(self):
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj'
+        ]
+        self.assertIsNone(first_page.previous_cursor)
+        response = self.client.get(
+            reverse('posts:index') + f'?after={first_page.next_cursor}'
+        )
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), self.posts_on_second_page)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_index_previous_cursor_returns_first_page(self):
+        first_page = self.client.get(reverse('posts:index')).context[
+            'page_obj'
+        ]
+        second_page = self.client.get(
+            reverse('posts:index') + f'?after={first_page.next_cursor}'
+        ).context['page_obj']
+        response = self.client.get(
+            reverse('posts:index') + f'?before={second_page.previous_cursor}'
+        )
+        self.assertEqual(
+            list(response.context['page_obj']),
+            list(first_page)
+        )
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+
+    def test_broken_cursor_returns_first_page(self):
+        response = self.client.get(reverse('posts:index') + '?after=%%%')
+        self.assertEqual(
+            len(response.context['page_obj']),
+            settings.POSTS_PER_PAGE
+        )
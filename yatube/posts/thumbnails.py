@@ -0,0 +1,116 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Миниатюра строится пулом потоков сразу после сохранения поста,
+а не при первом показе страницы. Пока она не готова, шаблоны
+показывают заглушку.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import sharding
+from .cache import bump_generations, post_scopes
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Единственный размер, в котором картинки постов показываются на сайте.
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+_executor = None
+# Картинки, миниатюры которых уже стоят в очереди этого процесса.
+_pending = set()
+_lock = threading.Lock()
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    def cached_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей или None, без генерации."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def ready_thumbnail(image):
+    if not image:
+        return None
+    return default.backend.cached_thumbnail(image.name, GEOMETRY, **OPTIONS)
+
+
+def build(post_id, name):
+    """Строит миниатюру картинки поста, если её ещё нет.
+
+    После постройки ленты с постом получают новое поколение, чтобы
+    закэшированные страницы с заглушкой сменились на страницы
+    с картинкой.
+    """
+    try:
+        if default.backend.cached_thumbnail(name, GEOMETRY, **OPTIONS):
+            return False
+        default.backend.get_thumbnail(name, GEOMETRY, **OPTIONS)
+        if not default.backend.cached_thumbnail(name, GEOMETRY, **OPTIONS):
+            return False
+        post = Post.objects.using(sharding.locate(post_id)).select_related(
+            'author'
+        ).filter(pk=post_id).first()
+        if post is not None:
+            bump_generations(post_scopes(post, post.group_id))
+        return True
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', name)
+        return False
+
+
+def _build_in_background(post_id, name):
+    close_old_connections()
+    try:
+        return build(post_id, name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def _submit(post_id, name):
+    if not settings.THUMBNAIL_WORKERS:
+        build(post_id, name)
+        return
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    _get_executor().submit(_build_in_background, post_id, name)
+
+
+def schedule(post):
+    """Ставит миниатюру поста в очередь после фиксации транзакции."""
+    if post.image:
+        post_id, name = post.pk, post.image.name
+        transaction.on_commit(lambda: _submit(post_id, name))
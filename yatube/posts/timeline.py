@@ -0,0 +1,251 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост раскладывается по лентам подписчиков автора в момент
+публикации, поэтому чтение ленты — это один проход по индексу
+(user, -post). Посты авторов с очень большим числом
+подписчиков не раскладываются, а подмешиваются при чтении.
+Когда автор переходит порог TIMELINE_FANOUT_LIMIT, его записи
+убираются из лент или раскладываются по ним заново.
+
+Когда посты разложены по шардам (posts.sharding), записи ленты
+не ведутся: лента собирается слиянием выборок постов подписок
+с каждого шарда.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import sharding
+from .following import followed_ids
+from .models import Follow, Post, TimelineEntry, UserCounter
+from .utils import CursorPaginator, FEED_ORDERING, MergedCursorPaginator
+
+
+class TimelinePaginator(CursorPaginator):
+    def item(self, row):
+        if isinstance(row, dict):
+            return {
+                name[len('post__'):]: value
+                for name, value in row.items() if name.startswith('post__')
+            }
+        return row.post
+
+
+def is_pulled(author_id):
+    """Посты автора читаются на лету, а не раскладываются по лентам."""
+    return UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам подписчиков его автора."""
+    if sharding.is_sharded() or is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if sharding.is_sharded() or is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        *FEED_ORDERING
+    ).values_list('id', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for post_id, pub_date in posts
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        author_id=author_id
+    ).delete()
+
+
+def _followers_count(author_id):
+    return UserCounter.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def followed(follow):
+    """Обновляет ленты после подписки; счётчик уже увеличен."""
+    if sharding.is_sharded():
+        return
+    if _followers_count(follow.author_id) == (
+        settings.TIMELINE_FANOUT_LIMIT + 1
+    ):
+        # Автор стал «звездой»: его посты подмешиваются при чтении,
+        # и разложенные записи дали бы в лентах дубли.
+        TimelineEntry.objects.filter(author_id=follow.author_id).delete()
+    backfill(follow.user_id, follow.author_id)
+
+
+def unfollowed(follow):
+    """Обновляет ленты после отписки; счётчик уже уменьшен."""
+    trim(follow.user_id, follow.author_id)
+    if not sharding.is_sharded() and _followers_count(
+        follow.author_id
+    ) == settings.TIMELINE_FANOUT_LIMIT:
+        refill(follow.author_id)
+
+
+def refill(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков.
+
+    Нужна, когда автор перестаёт быть «звездой»: посты, вышедшие
+    за это время, ни в одну ленту не попали. Одним INSERT ... SELECT,
+    уже разложенные посты пропускаются.
+    """
+    names = {
+        'timeline': TimelineEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT OR IGNORE INTO {timeline}
+                (user_id, post_id, author_id, pub_date)
+            SELECT follow.user_id, post.id, post.author_id, post.pub_date
+            FROM {follow} follow
+            CROSS JOIN (
+                SELECT id, author_id, pub_date
+                FROM {post}
+                WHERE author_id = %s
+                ORDER BY id DESC
+                LIMIT %s
+            ) post
+            WHERE follow.author_id = %s
+            """.format(**names),
+            [author_id, settings.TIMELINE_BACKFILL, author_id]
+        )
+        return cursor.rowcount
+
+
+def rebuild(first_id, last_id):
+    """Собирает заново ленты читателей с id из [first_id, last_id].
+
+    Одним INSERT ... SELECT: для каждой подписки берутся последние
+    TIMELINE_BACKFILL постов автора, авторы-«звёзды» пропускаются.
+    Нужна после загрузки постов и подписок мимо сигналов, поэтому
+    счётчики подписчиков к этому моменту должны быть пересчитаны.
+    """
+    if sharding.is_sharded():
+        return 0
+    names = {
+        'timeline': TimelineEntry._meta.db_table,
+        'follow': Follow._meta.db_table,
+        'post': Post._meta.db_table,
+        'counter': UserCounter._meta.db_table,
+    }
+    with transaction.atomic(), connection.cursor() as cursor:
+        TimelineEntry.objects.filter(
+            user_id__gte=first_id, user_id__lte=last_id
+        ).delete()
+        cursor.execute(
+            """
+            INSERT INTO {timeline} (user_id, post_id, author_id, pub_date)
+            SELECT follow.user_id, post.id, post.author_id, post.pub_date
+            FROM {follow} follow
+            JOIN (
+                SELECT id, author_id, pub_date, ROW_NUMBER() OVER (
+                    PARTITION BY author_id ORDER BY id DESC
+                ) AS position
+                FROM {post}
+            ) post ON post.author_id = follow.author_id
+            LEFT JOIN {counter} counter
+                ON counter.user_id = follow.author_id
+            WHERE follow.user_id BETWEEN %s AND %s
+                AND post.position <= %s
+                AND COALESCE(counter.followers_count, 0) <= %s
+            """.format(**names),
+            [
+                first_id, last_id,
+                settings.TIMELINE_BACKFILL, settings.TIMELINE_FANOUT_LIMIT
+            ]
+        )
+        return cursor.rowcount
+
+
+def follow_paginator(user, fields=None):
+    """Пагинатор ленты подписок: разложенные посты плюс посты «звёзд».
+
+    С fields страница состоит из словарей values() с этими полями
+    поста, а не из объектов Post.
+    """
+    per_page = settings.POSTS_PER_PAGE
+    if sharding.is_sharded():
+        return _sharded_follow_paginator(user, fields, per_page)
+    entries = TimelineEntry.objects.filter(user=user)
+    if fields is None:
+        entries = entries.select_related('post__author', 'post__group')
+    else:
+        entries = entries.values(
+            'post_id', *(f'post__{name}' for name in fields)
+        )
+    pushed = TimelinePaginator(entries, per_page, ('-post_id',))
+    pulled_authors = list(
+        UserCounter.objects.filter(
+            user__following__user=user,
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).values_list('user_id', flat=True)
+    )
+    if not pulled_authors:
+        return pushed
+    # Посты всех «звёзд» — одной выборкой по убыванию id, так что
+    # страница стоит два запроса при любом числе таких подписок.
+    posts = Post.objects.filter(author_id__in=pulled_authors)
+    if fields is None:
+        posts = posts.select_related('author', 'group')
+    else:
+        posts = posts.values(*fields)
+    pulled = CursorPaginator(posts, per_page)
+    return MergedCursorPaginator([pushed, pulled], per_page)
+
+
+def _sharded_follow_paginator(user, fields, per_page):
+    """Посты подписок с каждого шарда, слитые по id."""
+    authors = {}
+    for author_id in followed_ids(user):
+        authors.setdefault(sharding.shard_for(author_id), []).append(
+            author_id
+        )
+    if not authors:
+        return CursorPaginator(Post.objects.none(), per_page)
+    paginators = []
+    for alias, author_ids in authors.items():
+        posts = Post.objects.using(alias).filter(author_id__in=author_ids)
+        if fields is None:
+            posts = posts.select_related('author', 'group')
+        else:
+            posts = posts.values(*fields)
+        paginators.append(CursorPaginator(posts, per_page))
+    return MergedCursorPaginator(paginators, per_page)
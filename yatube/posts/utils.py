@@ -1,9 +1,264 @@
+import base64
+import heapq
+import json
+from contextlib import contextmanager
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+from . import sharding
+from .models import Comment
+
+# Id постов и комментариев растут со временем (core.snowflake),
+# поэтому курсор — один первичный ключ.
+FEED_ORDERING = ('-id',)
+COMMENT_ORDERING = ('-id',)
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (keyset) без COUNT(*) и OFFSET.
+
+    Страница выбирается условием на поля сортировки относительно
+    курсора, поэтому страница N стоит столько же, сколько первая.
+    Все поля сортировки должны идти в одном направлении.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = ordering[0].startswith('-')
+        super().__init__(object_list.order_by(*ordering), per_page)
+
+    def row_key(self, row):
+        if isinstance(row, dict):
+            # Строка выборки values().
+            return tuple(row[name] for name in self.fields)
+        return tuple(
+            getattr(row, self._field(name).attname) for name in self.fields
+        )
+
+    def item(self, row):
+        """Объект, который попадёт на страницу вместо строки выборки."""
+        return row
+
+    def encode_cursor(self, key):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in key
+        ]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает значения полей курсора или None, если он испорчен."""
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if len(values) != len(self.fields):
+                return None
+            return [
+                self.cursor_value(name, value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def cursor_value(self, name, value):
+        return self._field(name).to_python(value)
+
+    def _field(self, name):
+        return self.object_list.model._meta.get_field(name)
+
+    def _seek(self, values, forward):
+        """Условие «строго после курсора» (или «строго до» при forward=False).
+
+        Первое поле дополнительно ограничено нестрогим неравенством,
+        чтобы база могла начать поиск по индексу, а не просматривать
+        его с начала.
+        """
+        lookup = 'lt' if forward == self.descending else 'gt'
+        last = len(self.fields) - 1
+        condition = Q(**{f'{self.fields[last]}__{lookup}': values[last]})
+        for index in reversed(range(last)):
+            name, value = self.fields[index], values[index]
+            condition = (
+                Q(**{f'{name}__{lookup}': value})
+                | (Q(**{name: value}) & condition)
+            )
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & condition
+
+    def window(self, after=None, before=None):
+        """Не больше per_page + 1 строк по ходу движения от курсора."""
+        queryset = self.object_list
+        if before is not None:
+            queryset = queryset.filter(
+                self._seek(before, forward=False)
+            ).reverse()
+        elif after is not None:
+            queryset = queryset.filter(self._seek(after, forward=True))
+        return list(queryset[:self.per_page + 1])
+
+    def cursor_page(self, after=None, before=None):
+        """Страница после курсора after или перед курсором before."""
+        rows = self.window(after, before)
+        overflow = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if before is not None:
+            rows.reverse()
+            return self._make_page(rows, None, overflow, True)
+        return self._make_page(rows, None, after is not None, overflow)
+
+    def legacy_page(self, number):
+        """Совместимость со старыми ссылками вида ?page=N (через OFFSET)."""
+        page = self.get_page(number)
+        return self._make_page(
+            list(page.object_list),
+            page.number,
+            page.has_previous(),
+            page.has_next()
+        )
+
+    def _make_page(self, rows, number, has_previous, has_next):
+        page = Page([self.item(row) for row in rows], number, self)
+        page.previous_cursor = (
+            self.encode_cursor(self.row_key(rows[0]))
+            if rows and has_previous else None
+        )
+        page.next_cursor = (
+            self.encode_cursor(self.row_key(rows[-1]))
+            if rows and has_next else None
+        )
+        return page
 
 
-def get_page_obj(request, posts):
-    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
+class MergedCursorPaginator(CursorPaginator):
+    """Сливает несколько курсорных выборок с одинаковым ключом в одну ленту.
+
+    Каждый источник отдаёт своё окно от того же курсора, окна
+    сливаются по ключу, повторяющиеся ключи отбрасываются.
+    """
+
+    def __init__(self, paginators, per_page):
+        self.paginators = paginators
+        self.ordering = paginators[0].ordering
+        self.fields = paginators[0].fields
+        self.descending = paginators[0].descending
+        Paginator.__init__(self, [], per_page)
+
+    def row_key(self, row):
+        return row[0]
+
+    def item(self, row):
+        return row[1]
+
+    def decode_cursor(self, cursor):
+        return self.paginators[0].decode_cursor(cursor)
+
+    def _merge(self, windows, reverse):
+        rows, seen = [], set()
+        for key, item in heapq.merge(
+            *windows, key=lambda row: row[0], reverse=reverse
+        ):
+            if key not in seen:
+                seen.add(key)
+                rows.append((key, item))
+        return rows
+
+    def window(self, after=None, before=None):
+        windows = [
+            [
+                (paginator.row_key(row), paginator.item(row))
+                for row in paginator.window(after, before)
+            ]
+            for paginator in self.paginators
+        ]
+        reverse = self.descending == (before is None)
+        return self._merge(windows, reverse)[:self.per_page + 1]
+
+    def legacy_page(self, number):
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        limit = number * self.per_page
+        windows = [
+            [
+                (paginator.row_key(row), paginator.item(row))
+                for row in paginator.object_list[:limit + 1]
+            ]
+            for paginator in self.paginators
+        ]
+        rows = self._merge(windows, self.descending)
+        return self._make_page(
+            rows[limit - self.per_page:limit],
+            number,
+            number > 1,
+            len(rows) > limit
+        )
+
+
+def paginate(request, paginator):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        return paginator.legacy_page(page_number)
+    return paginator.cursor_page(
+        after=paginator.decode_cursor(request.GET.get('after', '')),
+        before=paginator.decode_cursor(request.GET.get('before', '')),
+    )
+
+
+def feed_paginator(posts, per_page, ordering=FEED_ORDERING):
+    """Курсорный пагинатор выборки постов с учётом шардов.
+
+    Выборка, шард которой известен (явный using(), посты одного
+    автора, прилипание), читается целиком с него. Иначе с каждого
+    шарда берётся своё окно, и окна сливаются по ключу сортировки.
+    """
+    if (
+        not sharding.is_sharded()
+        or posts._db is not None
+        or sharding.route(posts.model, posts._hints) is not None
+    ):
+        return CursorPaginator(posts, per_page, ordering)
+    return MergedCursorPaginator(
+        [
+            CursorPaginator(posts.using(alias), per_page, ordering)
+            for alias in sharding.shards()
+        ],
+        per_page
+    )
+
+
+def get_page_obj(request, posts, ordering=FEED_ORDERING):
+    return paginate(
+        request,
+        feed_paginator(posts, settings.POSTS_PER_PAGE, ordering)
+    )
+
+
+def get_comments_page(request, post_id):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    return paginate(
+        request,
+        CursorPaginator(
+            comments, settings.COMMENTS_PER_PAGE, COMMENT_ORDERING
+        )
+    )
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Разрешает записать свои даты в поля с auto_now_add."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
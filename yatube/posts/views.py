@@ -1,16 +1,32 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError
 from django.shortcuts import get_object_or_404, render, redirect
-from django.views.decorators.cache import cache_page
-
-from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Comment, Follow
-from .utils import get_page_obj
-
 
-@cache_page(20, key_prefix='index_page')
+from core.budgets import query_budget
+from core.replicas import replica_reads
+from core.writer import write
+
+from .cache import feed_cache
+from .conditional import feed_condition, post_condition
+from .following import forget, is_following
+from .forms import PostForm, CommentForm, SearchForm
+from .models import Group, Post, User, Follow
+from .search import search_paginator
+from .sharding import is_sharded, post_shard
+from .timeline import follow_paginator
+from .utils import get_comments_page, get_page_obj, paginate
+
+
+@query_budget(5, per_database=1)
+@replica_reads
+@feed_condition(lambda: ['all'])
+@feed_cache(lambda: ['all'])
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.select_related('author').all()
+    posts = Post.objects.select_related('author', 'group')
     page_obj = get_page_obj(request, posts)
     context = {
         'page_obj': page_obj
@@ -18,10 +34,14 @@ def index(request):
     return render(request, template, context)
 
 
+@query_budget(6, per_database=1)
+@replica_reads
+@feed_condition(lambda slug: [f'group:{slug}'])
+@feed_cache(lambda slug: [f'group:{slug}'])
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.select_related('author')
     page_obj = get_page_obj(request, posts)
     context = {
         'group': group,
@@ -30,18 +50,21 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@query_budget(7)
+@replica_reads
+@feed_condition(lambda username: [f'author:{username}'])
+@feed_cache(lambda username: [f'author:{username}'])
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('author')
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    posts = author.posts.select_related('author', 'group')
     page_obj = get_page_obj(request, posts)
     following = (
-        request.user.is_authenticated
-        and request.user != author
-        and Follow.objects.filter(
-            user=request.user,
-            author=author
-        ).exists()
+        request.user != author
+        and is_following(request.user, author.pk)
     )
     context = {
         'page_obj': page_obj,
@@ -51,19 +74,60 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@post_shard
+@query_budget(7)
+@replica_reads
+@post_condition()
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    # Счётчиков пользователей на шардах нет, их прочитает отдельный
+    # запрос к основной базе.
+    author = 'author' if is_sharded() else 'author__counters'
+    post = get_object_or_404(
+        Post.objects.select_related(author, 'group'),
+        pk=post_id
+    )
     form = CommentForm()
-    comments = Comment.objects.filter(post=post)
     context = {
         'post': post,
         'form': form,
-        'comments': comments
+        'comments': get_comments_page(request, post.pk)
+    }
+    return render(request, template, context)
+
+
+@post_shard
+@query_budget(4)
+def post_comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать ещё»."""
+    template = 'posts/includes/comments.html'
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(request, post.pk)
+    }
+    return render(request, template, context)
+
+
+@query_budget(5, per_database=2)
+def search(request):
+    template = 'posts/search.html'
+    form = SearchForm(request.GET or None)
+    query = form.cleaned_data['q'] if form.is_valid() else ''
+    page_obj = paginate(
+        request,
+        search_paginator(query, settings.POSTS_PER_PAGE)
+    )
+    context = {
+        'form': form,
+        'query': query,
+        'page_obj': page_obj,
+        'extra_query': urlencode({'q': query}) if query else ''
     }
     return render(request, template, context)
 
 
+@query_budget(15)
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -78,16 +142,18 @@ def post_create(request):
     if form.is_valid():
         real_author = form.save(commit=False)
         real_author.author = request.user
-        real_author.save()
+        write(real_author.save)
         return redirect('posts:profile', request.user.username)
     return render(request, template, context)
 
 
+@post_shard
+@query_budget(12)
 @login_required
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, pk=post_id)
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post_id)
 
     form = PostForm(
@@ -96,7 +162,7 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        write(form.save)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -105,6 +171,8 @@ def post_edit(request, post_id):
     return render(request, template, context)
 
 
+@post_shard
+@query_budget(6)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -113,36 +181,38 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(6, per_database=1)
+@replica_reads
 @login_required
 def follow_index(request):
     template = 'posts/follow_index.html'
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page_obj(request, posts)
+    page_obj = paginate(request, follow_paginator(request.user))
     context = {
         'page_obj': page_obj
     }
     return render(request, template, context)
 
 
+@query_budget(14)
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if not Follow.objects.filter(
-            user=request.user,
-            author=author
-    ).exists() and request.user != author:
-        Follow.objects.create(user=request.user, author=author)
+    if request.user != author and not is_following(request.user, author.pk):
+        try:
+            write(Follow.objects.create, user=request.user, author=author)
+        except IntegrityError:
+            # Подписка уже есть, а кэш о ней ещё не знал.
+            forget(request.user.pk)
     return redirect('posts:profile', username)
 
 
+@query_budget(11)
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    following = Follow.objects.filter(user=request.user, author=author)
-    if following.exists():
-        following.delete()
+    write(Follow.objects.filter(user=request.user, author=author).delete)
     return redirect('posts:profile', username)
@@ -0,0 +1,23 @@
+// Кнопка «Показать ещё» подгружает следующую страницу комментариев
+// фрагментом и заменяет себя им. Без JavaScript ссылка просто
+// открывает пост со следующей страницей комментариев.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('a[data-fragment]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.dataset.fragment, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.closest('.comments-more').outerHTML = html;
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
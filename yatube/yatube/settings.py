@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 # from dotenv import load_dotenv
 #
 # load_dotenv()
@@ -18,6 +19,9 @@ import os
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
+# Запущены тесты (manage.py test или pytest).
+TESTING = 'test' in sys.argv or 'pytest' in sys.modules
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
@@ -51,7 +55,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.tracing.TracingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -90,13 +97,60 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# core.db.backends.sqlite3 включает WAL и прочие PRAGMA, берёт
+# блокировку на запись в начале транзакции и повторяет запросы,
+# упёршиеся в занятую базу. Соединение живёт CONN_MAX_AGE секунд
+# и проверяется перед каждым запросом.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3')
+        'ENGINE': 'core.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
     }
 }
 
+# Реплики только для чтения (core.replicas): ленты и страница поста
+# читают с одной из них. Реплика — обычный алиас в DATABASES, например
+#     'replica': {
+#         'ENGINE': 'core.db.backends.sqlite3',
+#         'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+#         'CONN_MAX_AGE': 600,
+#         'OPTIONS': {'pragmas': {'journal_mode': 'delete'}},
+#         'TEST': {'MIRROR': 'default'},
+#     }
+# Реплика, которую подменяет copy_replicas, должна быть без WAL:
+# файлы -wal и -shm старой копии не подходят новой.
+# Локальную копию SQLite обновляет manage.py copy_replicas.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = [
+    'posts.sharding.ShardRouter',
+    'core.replicas.ReplicaRouter',
+]
+# После записи браузер пользователя столько секунд читает
+# только основную базу.
+REPLICA_PIN_COOKIE = 'primary_pin'
+REPLICA_PIN_SECONDS = 15
+
+# Id постов и комментариев (core.snowflake) выдаёт сам процесс.
+# Номер воркера (0–1022) каждый процесс арендует в кэше, в том числе
+# после fork, и продлевает аренду на SNOWFLAKE_LEASE_TIMEOUT секунд.
+# Номера различны у процессов с общим кэшем; если машин несколько,
+# а кэш у каждой свой, номер задаётся явно переменной окружения
+# SNOWFLAKE_WORKER_ID, своим у каждого процесса.
+SNOWFLAKE_WORKER_ID = os.environ.get('SNOWFLAKE_WORKER_ID')
+SNOWFLAKE_LEASE_TIMEOUT = 60 * 10
+
+# Шарды постов и комментариев (posts.sharding): посты автора лежат
+# на шарде, выбранном по хэшу его id. Шард — алиас в DATABASES
+# с полной схемой (manage.py migrate --database=<алиас>), например
+#     POST_SHARDS = ['default', 'shard1', 'shard2']
+# Пользователей и группы на шарды копирует rebalance_shards, дальше
+# их поддерживают сигналы. После изменения списка посты переносит
+# на новые места manage.py rebalance_shards.
+POST_SHARDS = ['default']
+# Сколько секунд помнить, на каком шарде лежит пост.
+POST_SHARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -137,8 +191,11 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
-# STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
-STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
+# Исходники статики лежат в static/, collectstatic собирает их
+# с хэшами в именах и сжатыми копиями в collected_static/.
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -148,16 +205,85 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Префикс internal-location nginx, например '/protected-media/'.
+# Если задан, core.views.media только проверяет путь и отдаёт
+# X-Accel-Redirect, а сам файл nginx читает с диска.
+MEDIA_ACCEL_REDIRECT = ''
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'default.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+# Тесты чистят кэш и не должны ни трогать кэш разработчика на диске,
+# ни читать оставленное в нём прошлыми запусками.
+if TESTING:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
 
 EMPTY_VALUE_DISPLAY = '-пусто-'
+
+# Списки админки считают отфильтрованные строки не дальше этого числа.
+ADMIN_COUNT_LIMIT = 10000
+
+# Лента подписок: авторы, у которых подписчиков больше лимита,
+# не раскладываются по лентам, а подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BACKFILL = 200
+TIMELINE_BATCH_SIZE = 500
+
+# Карточки постов в лентах кэшируются до правки или удаления поста.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Страницы лент живут в кэше долго: при записи поста поколение ленты
+# меняется, и новые запросы сразу идут мимо старых страниц.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Множество авторов, на которых подписан пользователь, правится
+# при подписке и отписке, а срок жизни лишь страхует от расхождений.
+FOLLOWING_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Миниатюры картинок постов строятся в фоне сразу после сохранения поста.
+# При 0 воркеров миниатюра строится сразу после фиксации транзакции
+# в том же потоке: так тесты не оставляют за собой фоновых записей
+# во временный MEDIA_ROOT.
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_WORKERS = 0 if TESTING else 2
+
+# Записи представлений идут через одного писателя на процесс
+# (core.writer), который выполняет до WRITE_QUEUE_BATCH накопившихся
+# записей одной транзакцией. При 0 каждая запись выполняется сразу
+# в потоке запроса, как и миниатюры в тестах.
+WRITE_QUEUE_BATCH = 0 if TESTING else 64
+WRITE_QUEUE_TIMEOUT = 10
+
+# Трассировка запросов (core.tracing): доля запросов, которые пишутся
+# в TRACING_FILE со всеми спанами, и заголовок Server-Timing с суммами
+# по SQL, кэшу, шаблонам и миниатюрам. При 0 и False запросы
+# проходят без трассы.
+TRACING_SAMPLE_RATE = 0.0
+TRACING_SERVER_TIMING = False
+TRACING_FILE = os.path.join(BASE_DIR, 'traces', 'traces.jsonl')
+
+# Бюджеты запросов представлений (core.budgets): 'raise' — перерасход
+# роняет запрос (тесты, стейджинг), 'log' — в лог пишется доля
+# QUERY_BUDGET_SAMPLE_RATE перерасходов, 'off' — проверки нет.
+# Обращения sorl к хранилищу ключей миниатюр не считаются: это по
+# одному запросу на ещё не построенную миниатюру, а не N+1 в коде.
+QUERY_BUDGET_MODE = 'raise' if DEBUG or TESTING else 'log'
+QUERY_BUDGET_SAMPLE_RATE = 0.01
+QUERY_BUDGET_IGNORED_TABLES = ('thumbnail_kvstore',)
@@ -16,10 +16,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import media
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path(
@@ -43,7 +44,7 @@ urlpatterns = [
         include('posts.urls', namespace='posts')
     ),
     path('create/', include('posts.urls', namespace='posts')),
-
+    path(f'{settings.MEDIA_URL.lstrip("/")}<path:path>', media, name='media'),
 ]
 
 handler404 = 'core.views.page_not_found'
@@ -54,6 +55,3 @@ if settings.DEBUG:
     import debug_toolbar
 
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )